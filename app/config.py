@@ -11,4 +11,121 @@ class Settings:
     DB_URL: str = os.getenv('DATABASE_URL')
     TWINWORD_API_KEY: str = os.getenv('TWINWORD_API_KEY')
 
+    # In-memory cache of dictionary lookups
+    WORD_CACHE_SIZE: int = int(os.getenv('WORD_CACHE_SIZE', 10000))
+    WORD_CACHE_TTL: int = int(os.getenv('WORD_CACHE_TTL', 24 * 3600))
+    WORD_CACHE_NEGATIVE_TTL: int = int(os.getenv('WORD_CACHE_NEGATIVE_TTL', 3600))
+
+    # Shared HTTP client for outbound APIs
+    HTTP_LIMIT: int = int(os.getenv('HTTP_LIMIT', 100))
+    HTTP_LIMIT_PER_HOST: int = int(os.getenv('HTTP_LIMIT_PER_HOST', 20))
+    HTTP_DNS_TTL: int = int(os.getenv('HTTP_DNS_TTL', 300))
+    HTTP_KEEPALIVE: float = float(os.getenv('HTTP_KEEPALIVE', 30))
+    HTTP_TIMEOUT: float = float(os.getenv('HTTP_TIMEOUT', 10))
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3))
+
+    # Per-branch timeouts of a word lookup
+    DICTIONARY_TIMEOUT: float = float(os.getenv('DICTIONARY_TIMEOUT', 5))
+    TRANSLATION_TIMEOUT: float = float(os.getenv('TRANSLATION_TIMEOUT', 5))
+    EXAMPLE_TIMEOUT: float = float(os.getenv('EXAMPLE_TIMEOUT', 4))
+    WIKI_TIMEOUT: float = float(os.getenv('WIKI_TIMEOUT', 3))
+
+    # Upstream endpoints, overridden by staging & benchmark.py stubs
+    DICTIONARY_API_URL: str = os.getenv('DICTIONARY_API_URL', 'https://api.dictionaryapi.dev/api/v2/entries/en')
+    TWINWORD_API_URL: str = os.getenv('TWINWORD_API_URL', 'https://twinword-word-graph-dictionary.p.rapidapi.com')
+    WIKI_URL: str = os.getenv('WIKI_URL', 'https://en.wikipedia.org/wiki')
+
+    # Updates delivery: 'polling' or 'webhook'
+    BOT_MODE: str = os.getenv('BOT_MODE', 'polling')
+    WEBHOOK_BASE_URL: str = os.getenv('WEBHOOK_BASE_URL', '')
+    WEBHOOK_PATH: str = os.getenv('WEBHOOK_PATH', '/webhook')
+    WEBHOOK_SECRET: str = os.getenv('WEBHOOK_SECRET')
+    WEBHOOK_BACKGROUND: bool = os.getenv('WEBHOOK_BACKGROUND', 'true').lower() == 'true'
+
+    # Updates scheduling: chats run in parallel up to the limit, one chat in order
+    UPDATES_CONCURRENCY: int = int(os.getenv('UPDATES_CONCURRENCY', 50))
+    UPDATES_QUEUE_LIMIT: int = int(os.getenv('UPDATES_QUEUE_LIMIT', 1000))
+    UPDATES_CHAT_QUEUE_LIMIT: int = int(os.getenv('UPDATES_CHAT_QUEUE_LIMIT', 10))
+
+    # Worker processes behind the webhook front, 1 runs everything in one process
+    WORKERS: int = int(os.getenv('WORKERS', 1)) or os.cpu_count()
+    WORKERS_SOCKET_DIR: str = os.getenv('WORKERS_SOCKET_DIR', '/tmp/quizlet-bot')
+
+    # FSM records live in the database and expire after inactivity
+    FSM_TTL: int = int(os.getenv('FSM_TTL', 24 * 3600))
+    FSM_PURGE_INTERVAL: int = int(os.getenv('FSM_PURGE_INTERVAL', 3600))
+
+    # "My words" list
+    WORDS_PAGE_SIZE: int = int(os.getenv('WORDS_PAGE_SIZE', 15))
+
+    # Bulk import of word lists
+    IMPORT_CONCURRENCY: int = int(os.getenv('IMPORT_CONCURRENCY', 5))
+    IMPORT_MAX_WORDS: int = int(os.getenv('IMPORT_MAX_WORDS', 1000))
+    IMPORT_MAX_FILE_SIZE: int = int(os.getenv('IMPORT_MAX_FILE_SIZE', 512 * 1024))
+    IMPORT_PROGRESS_INTERVAL: float = float(os.getenv('IMPORT_PROGRESS_INTERVAL', 2))
+
+    # Outbound API limits (requests per second & burst), retries and circuit breaker
+    DICTIONARY_RATE: float = float(os.getenv('DICTIONARY_RATE', 10))
+    DICTIONARY_BURST: int = int(os.getenv('DICTIONARY_BURST', 20))
+    TWINWORD_RATE: float = float(os.getenv('TWINWORD_RATE', 1))
+    TWINWORD_BURST: int = int(os.getenv('TWINWORD_BURST', 3))
+    TRANSLATE_RATE: float = float(os.getenv('TRANSLATE_RATE', 5))
+    TRANSLATE_BURST: int = int(os.getenv('TRANSLATE_BURST', 10))
+    WIKI_RATE: float = float(os.getenv('WIKI_RATE', 5))
+    WIKI_BURST: int = int(os.getenv('WIKI_BURST', 10))
+    HTTP_RETRIES: int = int(os.getenv('HTTP_RETRIES', 2))
+    RETRY_BACKOFF: float = float(os.getenv('RETRY_BACKOFF', 0.3))
+    RETRY_BACKOFF_MAX: float = float(os.getenv('RETRY_BACKOFF_MAX', 3))
+    BREAKER_FAILURES: int = int(os.getenv('BREAKER_FAILURES', 5))
+    BREAKER_RESET_TIMEOUT: float = float(os.getenv('BREAKER_RESET_TIMEOUT', 30))
+
+    # Translation requests are sent in batches
+    TRANSLATE_BATCH_WINDOW: float = float(os.getenv('TRANSLATE_BATCH_WINDOW', 0.02))
+    TRANSLATE_BATCH_SIZE: int = int(os.getenv('TRANSLATE_BATCH_SIZE', 20))
+
+    # Logging: levels, opt-in sampled dumps of upstream responses
+    LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_BODIES: bool = os.getenv('LOG_BODIES', 'false').lower() == 'true'
+    LOG_BODY_SAMPLE_RATE: float = float(os.getenv('LOG_BODY_SAMPLE_RATE', 0.1))
+    LOG_BODY_MAX_CHARS: int = int(os.getenv('LOG_BODY_MAX_CHARS', 2000))
+
+    # Offline dictionary snapshot, see app/utils/snapshot.py
+    SNAPSHOT_PATH: str = os.getenv('SNAPSHOT_PATH', 'data/dictionary_snapshot.sqlite')
+    SNAPSHOT_SIZE: int = int(os.getenv('SNAPSHOT_SIZE', 20000))
+
+    # Optional pre-upload of popular audio to Telegram, via a service chat
+    AUDIO_PRELOAD_CHAT_ID: int = int(os.getenv('AUDIO_PRELOAD_CHAT_ID', 0))
+    AUDIO_PRELOAD_INTERVAL: int = int(os.getenv('AUDIO_PRELOAD_INTERVAL', 3600))
+    AUDIO_PRELOAD_BATCH: int = int(os.getenv('AUDIO_PRELOAD_BATCH', 50))
+
+    # Spaced repetition quiz
+    QUIZ_BATCH_SIZE: int = int(os.getenv('QUIZ_BATCH_SIZE', 20))
+    QUIZ_RELEARN_DELAY: int = int(os.getenv('QUIZ_RELEARN_DELAY', 600))
+    QUIZ_FLUSH_INTERVAL: float = float(os.getenv('QUIZ_FLUSH_INTERVAL', 5))
+    QUIZ_FLUSH_SIZE: int = int(os.getenv('QUIZ_FLUSH_SIZE', 200))
+
+    # Cold start: connections opened before accepting updates
+    WARM_DB_CONNECTIONS: int = int(os.getenv('WARM_DB_CONNECTIONS', 2))
+    WARM_HTTP: bool = os.getenv('WARM_HTTP', 'true').lower() == 'true'
+
+    # Database pool, per process: with WORKERS every worker has its own pool
+    DB_POOL_SIZE: int = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE: int = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING: bool = os.getenv('DB_POOL_PRE_PING', 'false').lower() == 'true'
+    # asyncpg prepared statements per connection
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100))
+    # pgbouncer in transaction mode: no statement cache and unique statement names
+    DB_PGBOUNCER: bool = os.getenv('DB_PGBOUNCER', 'false').lower() == 'true'
+    # Optional read replica for read-only queries
+    DB_REPLICA_URL: str | None = os.getenv('DATABASE_REPLICA_URL')
+
+    # "Did you mean" suggestions for typos, without network
+    SPELLING_CHECK: bool = os.getenv('SPELLING_CHECK', 'true').lower() == 'true'
+    SPELLING_WORDLIST_PATH: str = os.getenv('SPELLING_WORDLIST_PATH', 'data/words.txt')
+    SPELLING_MAX_DISTANCE: int = int(os.getenv('SPELLING_MAX_DISTANCE', 2))
+    SPELLING_MIN_LENGTH: int = int(os.getenv('SPELLING_MIN_LENGTH', 4))
+    SPELLING_SUGGESTIONS: int = int(os.getenv('SPELLING_SUGGESTIONS', 4))
+
 config = Settings()
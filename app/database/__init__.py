@@ -1,2 +1,2 @@
-from .database import get_session, async_session, engine, Base
-from .models import UserWord
+from .database import get_session, async_session, read_session, engine, read_engine, engines, Base
+from .models import UserWord, DictionaryEntry, FSMRecord
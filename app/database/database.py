@@ -1,15 +1,57 @@
+import time
 from typing import AsyncGenerator
+from uuid import uuid4
 
-from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app import config
+from app.utils.metrics import DB_ACQUIRE_LATENCY
 
 DATABASE_URL = config.DB_URL
 
-engine = create_async_engine(DATABASE_URL, echo=False, pool_pre_ping=True)
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    '''Connection pool that measures how long sessions wait for a connection'''
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_ACQUIRE_LATENCY.observe(time.perf_counter() - start)
+
+
+def make_engine(url: str) -> AsyncEngine:
+    '''Engine with pool settings from config, they apply to every process separately'''
+    connect_args = {}
+    if make_url(url).get_driver_name() == 'asyncpg':
+        connect_args['prepared_statement_cache_size'] = config.DB_STATEMENT_CACHE_SIZE
+        if config.DB_PGBOUNCER:
+            # Transactions of one client connection land on different server connections,
+            # statement names must not clash with the ones other clients prepared there
+            connect_args['prepared_statement_cache_size'] = 0
+            connect_args['prepared_statement_name_func'] = lambda: f'__asyncpg_{uuid4()}__'
+    return create_async_engine(
+        url, echo=False, poolclass=TimedQueuePool,
+        pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT, pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING, connect_args=connect_args,
+    )
+
+
+engine = make_engine(DATABASE_URL)
+# Read-only queries go to the replica if there is one, otherwise to the primary
+read_engine = make_engine(config.DB_REPLICA_URL) if config.DB_REPLICA_URL else engine
 
 async_session = async_sessionmaker(engine, expire_on_commit=False)
+read_session = async_sessionmaker(read_engine, expire_on_commit=False)
+
+# Pools by role, for metrics and startup
+engines = {'primary': engine}
+if read_engine is not engine:
+    engines['replica'] = read_engine
 
 
 class Base(AsyncAttrs, DeclarativeBase):
@@ -1,74 +1,327 @@
-from sqlalchemy import select, delete
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncIterator
 
-from app.database import async_session, UserWord
-from app.utils import DictionaryAPI, WordData
+from sqlalchemy import BigInteger, Row, bindparam, select, delete, update, exists, func, literal
+from sqlalchemy.dialects.postgresql import insert
 
+from app.config import config
+from app.database import async_session, read_session, UserWord, DictionaryEntry
+from app.utils import DictionaryAPI, WordData, word_cache
+from app.utils.singleflight import SingleFlight
+from app.utils.snapshot import snapshot
+from app.utils.spelling import spelling
 
-async def is_word_in_db(session, tg_id: int, word: str) -> UserWord | None:
-    '''Check, is the word already in DB or not yet (reuse session)'''
-    word = word.lower()
+
+logger = logging.getLogger(__name__)
+
+# Concurrent lookups of the same word share one DB read & API call
+word_lookups = SingleFlight()
+# Translations being filled in for saved entries, one task per word
+translation_backfills: dict[str, asyncio.Task] = {}
+
+
+async def get_entry(session, word: str) -> DictionaryEntry | None:
+    '''Returns shared dictionary entry for the word (reuse session)'''
     return await session.scalar(
-        select(UserWord).where(
-            (UserWord.tg_id == tg_id) & (UserWord.word == word)
+        select(DictionaryEntry).where(DictionaryEntry.word == word.lower())
+    )
+
+async def save_entry(word_data: WordData) -> None:
+    '''Stores API result in the shared dictionary, keeps the first one on conflict'''
+    async with async_session() as session:
+        await session.execute(
+            insert(DictionaryEntry)
+            .values(**word_data.model_dump())
+            .on_conflict_do_nothing(index_elements=[DictionaryEntry.word])
         )
+        await session.commit()
+    spelling.add(word_data.word)
+
+def is_known_word(word: str) -> bool:
+    '''The word was found by a recent lookup or is in the snapshot, checked without I/O'''
+    word_data = word_cache.get(word.lower()) or snapshot.get(word.lower())
+    return bool(word_data and word_data.has_details)
+
+def insert_known_entries(words: list[str]):
+    '''
+    INSERT of entries for words that were served from the snapshot or cache
+    and so aren't in the shared dictionary yet. None if there are no such words
+    '''
+    known = [word_data.model_dump() for word in words
+             if (word_data := word_cache.get(word) or snapshot.get(word)) and word_data.has_details]
+    if not known:
+        return None
+    return insert(DictionaryEntry).values(known).on_conflict_do_nothing(index_elements=[DictionaryEntry.word])
+
+def entry_to_word_data(entry: DictionaryEntry) -> WordData:
+    '''Converts shared dictionary entry to WordData'''
+    return WordData(
+        word=entry.word,
+        transcription=entry.transcription,
+        translation=entry.translation,
+        example=entry.example,
+        audio_url=entry.audio_url,
+        audio_file_id=entry.audio_file_id
     )
 
-async def add_user_word(
-        tg_id: int,
-        word: str,
-        transcription: str,
-        translation: str,
-        example: str,
-        audio_url: str
-        ) -> bool:
+async def add_user_word(tg_id: int, word: str) -> bool:
     '''
-    Returns False if word already in database,
-    otherwise adds the word and returns True
+    Returns False if word already in user's dictionary or was never looked up,
+    otherwise links the shared entry to the user and returns True.
+    Single INSERT ... SELECT ... ON CONFLICT DO NOTHING, safe for double taps.
+    Words served from the snapshot get their entry here, on the first save
     '''
     word = word.lower()
+    entry = select(literal(tg_id, BigInteger), DictionaryEntry.word, DictionaryEntry.id).where(
+        DictionaryEntry.word == word
+    )
+    stmt = (
+        insert(UserWord)
+        .from_select(['tg_id', 'word', 'entry_id'], entry)
+        .on_conflict_do_nothing(index_elements=[UserWord.tg_id, UserWord.word])
+        .returning(UserWord.id)
+    )
     async with async_session() as session:
-        if await is_word_in_db(session, tg_id, word):
-            return False
-
-        new_word = UserWord(
-            tg_id=tg_id,
-            word=word,
-            transcription=transcription,
-            translation=translation,
-            example=example,
-            audio_url=audio_url
-        )
-        session.add(new_word)
+        added = await session.scalar(stmt)
+        if added is None and (entries := insert_known_entries([word])) is not None:
+            await session.execute(entries)  # the entry may be missing, not the user's word
+            added = await session.scalar(stmt)
         await session.commit()
-        return True
+        return added is not None
 
-async def get_word_from_db_or_api(tg_id: int, word: str) -> WordData | None:
-    '''Returns word data either from database or API'''
-    word = word.lower()
+async def add_user_words(tg_id: int, words: list[str]) -> int:
+    '''
+    Links many looked up words to the user in one multi-row INSERT ... SELECT,
+    returns count of newly added ones
+    '''
+    if not words:
+        return 0
+    words = [word.lower() for word in words]
 
-    # Check the database
+    entries = select(literal(tg_id, BigInteger), DictionaryEntry.word, DictionaryEntry.id).where(
+        DictionaryEntry.word.in_(words)
+    )
+    stmt = (
+        insert(UserWord)
+        .from_select(['tg_id', 'word', 'entry_id'], entries)
+        .on_conflict_do_nothing(index_elements=[UserWord.tg_id, UserWord.word])
+        .returning(UserWord.id)
+    )
     async with async_session() as session:
-        existing = await is_word_in_db(session, tg_id, word)
-        if existing:
-            return WordData(
-                word=existing.word,
-                transcription=existing.transcription,
-                translation=existing.translation,
-                example=existing.example,
-                audio_url=existing.audio_url
-            )
-    
-    # If not exist in DB - go to API
+        if (known := insert_known_entries(words)) is not None:
+            await session.execute(known)
+        added = (await session.scalars(stmt)).all()
+        await session.commit()
+        return len(added)
+
+async def get_word_from_db_or_api(word: str) -> WordData | None:
+    '''Returns word data either from shared dictionary or API'''
+    word = word.lower()
+
+    # Recent answers, including "not found" ones, are kept in memory
+    cached = word_cache.get(word)
+    if cached:
+        return cached
+
+    return await word_lookups.do(word, lambda: _lookup_word(word))
+
+async def _lookup_word(word: str) -> WordData | None:
+    '''
+    Looks the word up in local snapshot, shared dictionary, then in API, and caches the result.
+    UpstreamUnavailable goes to the caller and nothing is cached
+    '''
+    # Common words are in local snapshot, no network or database needed.
+    # The entry is created only when a user saves the word
+    word_data = snapshot.get(word)
+    if word_data and word_data.translation:
+        word_cache.set(word, word_data)
+        return word_data
+
+    # Check the shared dictionary, filled by lookups of all users
+    async with read_session() as session:
+        entry = await get_entry(session, word)
+    if entry:
+        word_data = entry_to_word_data(entry)
+        if word_data.translation is None:
+            # Answered as stored, the translation is filled in without the user waiting
+            word_cache.set(word, word_data, ttl=config.WORD_CACHE_NEGATIVE_TTL)
+            backfill_translation(word_data)
+        else:
+            word_cache.set(word, word_data)
+        return word_data
+
+    # If not exist in DB - go to API and remember the result for everyone
     api = DictionaryAPI(word)
-    return await api.get_word_full_data()
+    word_data = await api.get_word_full_data()
+    if word_data and word_data.has_details:
+        # Saved even without translation, it is filled in after the negative TTL
+        await save_entry(word_data)
+        word_cache.set(word, word_data, ttl=None if word_data.translation else config.WORD_CACHE_NEGATIVE_TTL)
+    elif word_data:
+        word_cache.set(word, word_data, ttl=config.WORD_CACHE_NEGATIVE_TTL)
+    return word_data
+
+def backfill_translation(word_data: WordData) -> None:
+    '''Starts translating the word in background if it isn't being translated yet'''
+    word = word_data.word
+    if word in translation_backfills:
+        return
+    task = asyncio.create_task(_backfill_translation(word_data))
+    translation_backfills[word] = task
+    task.add_done_callback(lambda _: translation_backfills.pop(word, None))
+
+async def _backfill_translation(word_data: WordData) -> None:
+    '''
+    Translates the word again if translator failed when the entry was saved.
+    On failure the entry stays cached as is until the negative TTL runs out
+    '''
+    try:
+        translation = await DictionaryAPI(word_data.word).get_translation()
+        if not translation:
+            return
+
+        async with async_session() as session:
+            await session.execute(
+                update(DictionaryEntry)
+                .where((DictionaryEntry.word == word_data.word) & DictionaryEntry.translation.is_(None))
+                .values(translation=translation)
+            )
+            await session.commit()
+    except Exception:
+        logger.exception('Translation backfill failed', extra={'word': word_data.word})
+        return
+    word_cache.set(word_data.word, word_data.model_copy(update={'translation': translation}))
+
+async def get_word_example(word: str) -> str | None:
+    '''Returns stored example or fetches it from API and writes it back to the entry'''
+    word = word.lower()
+    cached = word_cache.get(word)
+    if cached and cached.example:
+        return cached.example
+
+    async with read_session() as session:
+        entry = await get_entry(session, word)
+        if entry and entry.example:
+            return entry.example
+
+    # Recently checked words without example
+    if word_cache.get(('example', word)) is not None:
+        return None
+
+    return await word_lookups.do(('example', word), lambda: _fetch_example(word))
+
+async def _fetch_example(word: str) -> str | None:
+    '''Fetches example from API, stores found one for everyone. Failed calls aren't cached'''
+    example = await DictionaryAPI(word).get_example()
+    if not example:
+        word_cache.set(('example', word), '', ttl=config.WORD_CACHE_NEGATIVE_TTL)
+        return None
 
-async def get_all_user_words(tg_id: int) -> list[UserWord]:
-    '''Returns user words or replies there is no words yet'''
     async with async_session() as session:
-        user_words = select(UserWord).where(UserWord.tg_id == tg_id).order_by(UserWord.word)
-        result = await session.execute(user_words)
-        return result.scalars().all()
-    
+        await session.execute(
+            update(DictionaryEntry)
+            .where(DictionaryEntry.word == word)
+            .values(example=example)
+        )
+        await session.commit()
+
+    cached = word_cache.get(word)
+    if cached:
+        cached.example = example
+    return example
+
+async def save_audio_file_id(word: str, file_id: str | None) -> None:
+    '''Remembers Telegram file_id of uploaded audio, so next sends don't download it again'''
+    word = word.lower()
+    async with async_session() as session:
+        await session.execute(
+            update(DictionaryEntry)
+            .where(DictionaryEntry.word == word)
+            .values(audio_file_id=file_id)
+        )
+        await session.commit()
+
+    cached = word_cache.get(word)
+    if cached:
+        cached.audio_file_id = file_id
+
+async def get_entries_without_audio_file(limit: int) -> list[Row]:
+    '''Returns (word, audio_url) of the most saved entries whose audio isn't uploaded yet'''
+    query = (
+        select(DictionaryEntry.word, DictionaryEntry.audio_url)
+        .join(UserWord, UserWord.entry_id == DictionaryEntry.id)
+        .where(DictionaryEntry.audio_url.is_not(None) & DictionaryEntry.audio_file_id.is_(None))
+        .group_by(DictionaryEntry.id)
+        .order_by(func.count(UserWord.id).desc())
+        .limit(limit)
+    )
+    async with read_session() as session:
+        return (await session.execute(query)).all()
+
+async def get_user_words_page(
+        tg_id: int,
+        after_id: int | None = None,
+        before_id: int | None = None,
+        limit: int = config.WORDS_PAGE_SIZE
+        ) -> tuple[list[Row], bool]:
+    '''
+    Returns one page of (id, word, translation) rows sorted by word and
+    a flag whether there are more words in that direction.
+    Keyset pagination on (tg_id, word): the page starts after/before the word
+    of the given row, so each page is one small indexed query.
+    '''
+    query = (
+        select(UserWord.id, UserWord.word, DictionaryEntry.translation)
+        .join(DictionaryEntry, UserWord.entry_id == DictionaryEntry.id)
+        .where(UserWord.tg_id == tg_id)
+    )
+    cursor_id = before_id or after_id
+    if cursor_id:
+        cursor = (
+            select(UserWord.word)
+            .where((UserWord.id == cursor_id) & (UserWord.tg_id == tg_id))
+            .scalar_subquery()
+        )
+        query = query.where(UserWord.word < cursor if before_id else UserWord.word > cursor)
+    query = query.order_by(UserWord.word.desc() if before_id else UserWord.word).limit(limit + 1)
+
+    async with read_session() as session:
+        rows = (await session.execute(query)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before_id:
+        rows.reverse()
+    return rows, has_more
+
+async def has_user_words(tg_id: int) -> bool:
+    '''Checks if user saved at least one word'''
+    async with read_session() as session:
+        return await session.scalar(select(exists().where(UserWord.tg_id == tg_id)))
+
+async def stream_user_words(tg_id: int, extended: bool = False,
+                            batch_size: int = 1000) -> AsyncIterator[list[Row]]:
+    '''
+    Yields batches of (word, translation[, transcription, example]) rows
+    read by server-side cursor, without loading whole dictionary
+    '''
+    columns = [UserWord.word, DictionaryEntry.translation]
+    if extended:
+        columns += [DictionaryEntry.transcription, DictionaryEntry.example]
+
+    async with read_session() as session:
+        result = await session.stream(
+            select(*columns)
+            .join(DictionaryEntry, UserWord.entry_id == DictionaryEntry.id)
+            .where(UserWord.tg_id == tg_id)
+            .order_by(UserWord.word)
+            .execution_options(yield_per=batch_size)
+        )
+        async for rows in result.partitions():
+            yield rows
+
 async def delete_word_from_db(tg_id: int, word: str) -> bool:
     '''Deletes written word from database'''
     async with async_session() as session:
@@ -79,9 +332,57 @@ async def delete_word_from_db(tg_id: int, word: str) -> bool:
         result = await session.execute(del_action)
         await session.commit()
         return result.rowcount > 0
-    
+
 async def clear_user_db(tg_id: int) -> bool:
     '''Deletes all user words from database'''
     async with async_session() as session:
         await session.execute(delete(UserWord).where(UserWord.tg_id == tg_id))
         await session.commit()
+
+QUIZ_COLUMNS = (UserWord.id, UserWord.word, DictionaryEntry.transcription, DictionaryEntry.translation,
+                UserWord.interval_days, UserWord.ease, UserWord.repetitions)
+
+async def get_due_cards(tg_id: int, limit: int = config.QUIZ_BATCH_SIZE) -> list[Row]:
+    '''
+    Returns user words due for review, the most overdue first.
+    One range scan of (tg_id, due_at) index, cards carry everything the quiz shows
+    '''
+    async with async_session() as session:
+        return (await session.execute(
+            select(*QUIZ_COLUMNS)
+            .join(DictionaryEntry, UserWord.entry_id == DictionaryEntry.id)
+            .where((UserWord.tg_id == tg_id) & (UserWord.due_at <= func.now())
+                   & DictionaryEntry.translation.is_not(None))
+            .order_by(UserWord.due_at)
+            .limit(limit)
+        )).all()
+
+async def get_quiz_card(tg_id: int, card_id: int) -> Row | None:
+    '''Returns one card of the user by its id, words without translation aren't quizzed'''
+    async with async_session() as session:
+        return (await session.execute(
+            select(*QUIZ_COLUMNS)
+            .join(DictionaryEntry, UserWord.entry_id == DictionaryEntry.id)
+            .where((UserWord.id == card_id) & (UserWord.tg_id == tg_id)
+                   & DictionaryEntry.translation.is_not(None))
+        )).first()
+
+async def get_next_due_at(tg_id: int) -> datetime | None:
+    '''Returns the time of the nearest review'''
+    async with async_session() as session:
+        return await session.scalar(select(func.min(UserWord.due_at)).where(UserWord.tg_id == tg_id))
+
+async def save_reviews(reviews: dict[int, dict]) -> None:
+    '''Writes review state of many cards in one executemany, deleted words are skipped'''
+    table = UserWord.__table__
+    # Bind names must differ from column names in SET clause
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam('card_id'))
+        .values({name: bindparam(f'new_{name}') for name in ('due_at', 'interval_days', 'ease', 'repetitions')})
+    )
+    params = [{'card_id': card_id, **{f'new_{name}': value for name, value in values.items()}}
+              for card_id, values in reviews.items()]
+    async with async_session() as session:
+        await session.execute(stmt, params)
+        await session.commit()
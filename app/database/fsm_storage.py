@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import case, delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import config
+from app.database import async_session, FSMRecord
+
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseStorage(BaseStorage):
+    '''
+    FSM storage in the bot database: survives restarts and is shared by all processes.
+    Every write prolongs the record for ttl seconds, expired records
+    are treated as empty and removed by purge_expired().
+    '''
+    def __init__(
+            self,
+            session_maker: async_sessionmaker[AsyncSession] = async_session,
+            ttl: int = config.FSM_TTL,
+            key_builder: KeyBuilder | None = None
+            ):
+        self.session_maker = session_maker
+        self.ttl = timedelta(seconds=ttl)
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+    async def _upsert(self, key: StorageKey, **values: Any) -> None:
+        '''Writes state or data, the other one is kept only if record is still alive'''
+        now = datetime.now(timezone.utc)
+        stmt = insert(FSMRecord).values(
+            key=self.key_builder.build(key),
+            state=values.get('state'),
+            data=values.get('data', {}),
+            expires_at=now + self.ttl
+        )
+        alive = FSMRecord.expires_at > now
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FSMRecord.key],
+            set_={
+                name: stmt.excluded[name] if name in values
+                else case((alive, FSMRecord.__table__.c[name]), else_=stmt.excluded[name])
+                for name in ('state', 'data')
+            } | {'expires_at': stmt.excluded.expires_at}
+        )
+        async with self.session_maker() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    async def _get(self, key: StorageKey) -> FSMRecord | None:
+        '''Returns alive record for the key'''
+        async with self.session_maker() as session:
+            return await session.scalar(
+                select(FSMRecord).where(
+                    (FSMRecord.key == self.key_builder.build(key))
+                    & (FSMRecord.expires_at > datetime.now(timezone.utc))
+                )
+            )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._upsert(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        record = await self._get(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        await self._upsert(key, data=data)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        record = await self._get(key)
+        return dict(record.data) if record and record.data else {}
+
+    async def purge_expired(self) -> int:
+        '''Deletes expired records, returns their count'''
+        async with self.session_maker() as session:
+            result = await session.execute(
+                delete(FSMRecord).where(FSMRecord.expires_at <= datetime.now(timezone.utc))
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def run_purging(self, interval: int = config.FSM_PURGE_INTERVAL) -> None:
+        '''Background loop that keeps the table small'''
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                purged = await self.purge_expired()
+                logger.info('Expired FSM records purged', extra={'purged': purged})
+            except Exception:
+                logger.exception('FSM purge failed')
+
+    async def close(self) -> None:
+        pass
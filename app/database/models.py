@@ -1,18 +1,49 @@
-from sqlalchemy import BigInteger, Index, String, Text
+from datetime import datetime
+
+from sqlalchemy import JSON, BigInteger, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
 
 
+class DictionaryEntry(Base):
+    '''Shared word data, fetched from the API once and reused by all users'''
+    __tablename__ = 'dictionary_entries'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    word: Mapped[str] = mapped_column(String(70), unique=True)
+    transcription: Mapped[str | None] = mapped_column(String(90))
+    translation: Mapped[str | None] = mapped_column(String(120))
+    example: Mapped[str | None] = mapped_column(Text)
+    audio_url: Mapped[str | None] = mapped_column(String(255))
+    audio_file_id: Mapped[str | None] = mapped_column(String(255))  # Telegram copy of audio_url
+
+
 class UserWord(Base):
-    '''The main table that stores all user-submitted words'''
+    '''The main table that links users with their saved dictionary entries'''
     __tablename__ = 'user_words'
-    __table_args__ = (Index('idx_user_word', 'tg_id', 'word'),)
+    __table_args__ = (
+        UniqueConstraint('tg_id', 'word', name='uq_user_word'),
+        Index('ix_user_words_due', 'tg_id', 'due_at'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    tg_id: Mapped[int] = mapped_column(BigInteger, index=True)
-    word: Mapped[str] = mapped_column(String(70), index=True)
-    transcription: Mapped[str] = mapped_column(String(90))
-    translation: Mapped[str] = mapped_column(String(120))
-    example: Mapped[str] = mapped_column(Text)
-    audio_url: Mapped[str] = mapped_column(String(255))
+    tg_id: Mapped[int] = mapped_column(BigInteger)
+    word: Mapped[str] = mapped_column(String(70))
+    entry_id: Mapped[int] = mapped_column(ForeignKey('dictionary_entries.id', ondelete='CASCADE'))
+
+    # Spaced repetition (SM-2) state, new words are due at once
+    due_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    interval_days: Mapped[int] = mapped_column(Integer, server_default='0')
+    ease: Mapped[float] = mapped_column(Float, server_default='2.5')
+    repetitions: Mapped[int] = mapped_column(Integer, server_default='0')
+
+
+class FSMRecord(Base):
+    '''Persistent FSM state & data of a chat, forgotten after expiry'''
+    __tablename__ = 'fsm_states'
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[str | None] = mapped_column(String(100))
+    data: Mapped[dict] = mapped_column(JSON, default=dict)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
@@ -1,12 +1,24 @@
+import html
+import time
+from datetime import timezone
+
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, ContentType, BufferedInputFile
+from aiogram.types import Message, CallbackQuery, ContentType
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 import app.keyboards as kb
+from app.config import config
 from app.database import db_requests as rq
-from app.utils import WordData, validate_word, export_to_csv, MenuButtons
+from app.utils import WordData, WordsExportFile, validate_word, MenuButtons
+from app.utils.bulk_import import parse_words, resolve_words
+from app.utils.dictionary import WordLookupResult
+from app.utils.resilience import UpstreamUnavailable
+from app.utils.quiz import quiz
+from app.utils.metrics import SPELLING_SUGGESTIONS
+from app.utils.spelling import spelling
 
 router = Router()
 
@@ -17,6 +29,7 @@ class DeleteStates(StatesGroup):
 
 
 GREETINGS = {'привет', 'здравствуй', 'hello', 'hi', 'hey', 'хай', 'эй', 'здоров'}
+WORD_EXPIRED = '⌛ Я уже забыл это слово, отправь его ещё раз'
 
 async def send_greeting(message: Message, state: FSMContext) -> None:
     '''Sends greeting message and help button'''
@@ -56,23 +69,31 @@ async def help(message: Message) -> None:
         '📘 Привести пример использования\n'
         '🔊 Прислать озвучку найденного слова\n'
         '💾 Сохранить слово в словарь\n'
-        '📁 Прислать твой словарь в файле, чтоб ты мог загрузить его на quizlet.com\n\n'
+        '📁 Прислать твой словарь в файле, чтоб ты мог загрузить его на quizlet.com или в Anki\n'
+        '🧠 Тренировать сохранённые слова: я напомню каждое, когда его пора повторить\n'
+        '📥 Добавить сразу много слов: пришли их списком (каждое с новой строки) или файлом .txt/.csv\n\n'
         '❗ Вводи английские слова (без цифр, символов, знаков препинания и пробелов)'
     )
 
+def render_words_page(rows) -> str:
+    '''Formats page of user words with translations'''
+    return '📚 <b>Твои слова:</b>\n\n' + '\n'.join(
+        f'• <b>{html.escape(w.word)}</b> — {html.escape(w.translation or "")}' for w in rows
+    )
+
 @router.message(F.text == MenuButtons.MY_WORDS)
 async def show_user_words(message: Message) -> None:
-    '''Shows user words saved in database'''
+    '''Shows the first page of user words saved in database'''
     tg_id = message.from_user.id
-    words = await rq.get_all_user_words(tg_id)
+    rows, has_next = await rq.get_user_words_page(tg_id)
 
-    if not words:
+    if not rows:
         await message.answer('📭 У тебя пока нет сохранённых слов...',
                              reply_markup=kb.main_menu())
         return
-    
-    msg = '📚 <b>Твои слова:</b>\n\n' + '\n'.join(f'• {w.word}' for w in words)
-    await message.answer(msg, parse_mode='HTML')
+
+    await message.answer(render_words_page(rows), parse_mode='HTML',
+                         reply_markup=kb.words_pages(rows[0].id, rows[-1].id, False, has_next))
     await message.answer(
         '❔ Что хочешь делать дальше?\n'
         'Можешь перейти по одной из кнопок меню,\n'
@@ -80,6 +101,28 @@ async def show_user_words(message: Message) -> None:
         reply_markup=kb.main_menu()
     )
 
+@router.callback_query(kb.WordsPageCallback.filter())
+async def turn_words_page(callback: CallbackQuery, callback_data: kb.WordsPageCallback) -> None:
+    '''Shows next or previous page of user words in the same message'''
+    tg_id = callback.from_user.id
+    rows, has_more = await rq.get_user_words_page(tg_id, after_id=callback_data.after or None,
+                                                  before_id=callback_data.before or None)
+    if rows:
+        has_prev = has_more if callback_data.before else True
+        has_next = True if callback_data.before else has_more
+    else:  # cursor word was deleted meanwhile, start over
+        rows, has_next = await rq.get_user_words_page(tg_id)
+        has_prev = False
+
+    await callback.answer()
+    if not rows:
+        await callback.message.edit_text('📭 У тебя пока нет сохранённых слов...')
+        return
+
+    await callback.message.edit_text(render_words_page(rows), parse_mode='HTML',
+                                     reply_markup=kb.words_pages(rows[0].id, rows[-1].id,
+                                                                 has_prev, has_next))
+
 @router.message(F.text == MenuButtons.DELETE_WORD)
 async def ask_word_to_del(message: Message, state: FSMContext) -> None:
     '''Asks user to input the word for deleting'''
@@ -107,25 +150,100 @@ async def ask_clear_dict(message: Message, state: FSMContext):
                          reply_markup=kb.confirm_clear_dict())
 
 @router.message(F.text == MenuButtons.EXPORT)
-async def send_csv(message: Message) -> None:
-    '''Sends user dict in csv file'''
+async def choose_export_format(message: Message) -> None:
+    '''Asks the format of dictionary file'''
     tg_id = message.from_user.id
-    csv_dict = await export_to_csv(tg_id)
 
-    if csv_dict == None:
+    if not await rq.has_user_words(tg_id):
         await message.answer('📭 У тебя пока нет сохранённых слов...',
                              reply_markup=kb.main_menu())
         return
-    
-    await message.answer_document(
-        document=BufferedInputFile(
-            file=csv_dict.read(),
-            filename='my_words.csv'
-        ),
-        caption='📄 Вот твой словарь. Можешь загрузить его на quizlet.com,\n'
-        'чтобы создать карточки для изучения'
+
+    await message.answer(
+        '📤 Выбери формат файла:\n\n'
+        '📄 CSV — таблица для Excel и Google Sheets\n'
+        '🟦 Quizlet — текст для импорта на quizlet.com\n'
+        '🃏 Anki — текст для импорта в Anki\n\n'
+        '➕ — вместе с транскрипцией и примером',
+        reply_markup=kb.export_formats()
+    )
+
+@router.callback_query(kb.ExportCallback.filter())
+async def send_export(callback: CallbackQuery, callback_data: kb.ExportCallback) -> None:
+    '''Sends user dict in chosen format, the file is streamed straight from DB'''
+    await callback.answer('📦 Готовлю файл...')
+
+    await callback.message.answer_document(
+        document=WordsExportFile(callback.from_user.id, callback_data.fmt, callback_data.extended),
+        caption='📄 Вот твой словарь. Можешь загрузить его на quizlet.com или в Anki,\n'
+        'чтобы создать карточки для изучения',
+        reply_markup=kb.main_menu()
     )
 
+def render_question(card) -> str:
+    '''Quiz card: the word only'''
+    return (f'❓ <b>{html.escape(card.word)}</b>\n'
+            f'🔊 {html.escape(card.transcription or "-нет транскрипции-")}\n\n'
+            'Вспомни перевод')
+
+async def no_due_words_text(tg_id: int) -> str:
+    '''Tells when the next review is'''
+    next_due = await rq.get_next_due_at(tg_id)
+    if next_due is None:
+        return '📭 У тебя пока нет сохранённых слов...'
+    return ('🎉 Все слова повторены!\n'
+            f'⏰ Следующее повторение: {next_due.astimezone(timezone.utc):%d.%m %H:%M} UTC')
+
+@router.message(F.text == MenuButtons.QUIZ)
+async def start_quiz(message: Message) -> None:
+    '''Starts quiz with the words due for review'''
+    tg_id = message.from_user.id
+    card = await quiz.next_card(tg_id)
+    if card is None:
+        await message.answer(await no_due_words_text(tg_id), reply_markup=kb.main_menu())
+        return
+
+    await message.answer(render_question(card), parse_mode='HTML',
+                         reply_markup=kb.quiz_question(card.id))
+
+@router.callback_query(kb.QuizCallback.filter(F.action == 'show'))
+async def show_quiz_answer(callback: CallbackQuery, callback_data: kb.QuizCallback) -> None:
+    '''Reveals translation and asks how well user remembered it'''
+    await callback.answer()
+    card = await quiz.next_card(callback.from_user.id)
+    if card is None or card.id != callback_data.card:
+        card = await rq.get_quiz_card(callback.from_user.id, callback_data.card)
+    if card is None:
+        await callback.message.edit_text('⚠️ Этого слова уже нет в словаре')
+        return
+
+    await callback.message.edit_text(
+        f'{render_question(card)}\n\n🌍 <b>{html.escape(card.translation)}</b>',
+        parse_mode='HTML',
+        reply_markup=kb.quiz_grades(card.id)
+    )
+
+@router.callback_query(kb.QuizCallback.filter(F.action == 'grade'))
+async def grade_quiz_card(callback: CallbackQuery, callback_data: kb.QuizCallback) -> None:
+    '''Records the answer and shows the next card in the same message'''
+    tg_id = callback.from_user.id
+    await quiz.answer(tg_id, callback_data.card, callback_data.grade)
+    await callback.answer()
+
+    card = await quiz.next_card(tg_id)
+    if card is None:
+        await callback.message.edit_text(await no_due_words_text(tg_id))
+        return
+    await callback.message.edit_text(render_question(card), parse_mode='HTML',
+                                     reply_markup=kb.quiz_question(card.id))
+
+@router.callback_query(kb.QuizCallback.filter(F.action == 'stop'))
+async def stop_quiz(callback: CallbackQuery) -> None:
+    '''Ends quiz, the answers given are kept'''
+    quiz.stop(callback.from_user.id)
+    await callback.answer()
+    await callback.message.edit_text('🏁 Тренировка окончена')
+
 @router.message(DeleteStates.confirm, F.text == '✅ Да')
 async def confirm_clear_dict(message: Message, state: FSMContext):
     '''Confirms clear user's dict'''
@@ -152,17 +270,106 @@ async def delete_word(message: Message, state: FSMContext) -> None:
 
     await state.clear()
 
+async def import_words(message: Message, text: str) -> None:
+    '''Validates the list, looks words up with progress updates and saves found ones at once'''
+    words, invalid = parse_words(text)
+    if not words:
+        await message.answer('⚠️ В списке нет ни одного подходящего английского слова',
+                             reply_markup=kb.main_menu())
+        return
+    if len(words) > config.IMPORT_MAX_WORDS:
+        await message.answer(f'🛑 Слишком много слов, за раз можно добавить до {config.IMPORT_MAX_WORDS}',
+                             reply_markup=kb.main_menu())
+        return
+
+    progress = await message.answer(f'⏳ Ищу слова: 0/{len(words)}')
+    last_update = time.monotonic()
+
+    async def on_progress(done: int) -> None:
+        nonlocal last_update
+        if time.monotonic() - last_update < config.IMPORT_PROGRESS_INTERVAL:
+            return
+        last_update = time.monotonic()
+        try:
+            await progress.edit_text(f'⏳ Ищу слова: {done}/{len(words)}')
+        except TelegramBadRequest:
+            pass
+
+    found, not_found, failed = await resolve_words(words, on_progress)
+    added = await rq.add_user_words(message.from_user.id, found)
+
+    report = (f'✅ Импорт завершён\n\n'
+              f'💾 Добавлено в словарь: {added}\n'
+              f'📚 Уже были в словаре: {len(found) - added}')
+    if not_found:
+        report += f'\n❌ Не найдены: {", ".join(not_found[:50])}'
+    if failed:
+        report += f'\n⏳ Не удалось проверить, словарь недоступен: {", ".join(failed[:50])}'
+    if invalid:
+        report += f'\n⚠️ Некорректные: {", ".join(invalid[:50])}'
+    await progress.edit_text(report)
+
+@router.message(F.document)
+async def import_file(message: Message) -> None:
+    '''Bulk import of words from .txt or .csv file, one word per line'''
+    document = message.document
+    if not (document.file_name or '').lower().endswith(('.txt', '.csv')):
+        await message.answer('⚠️ Пришли файл .txt или .csv, по одному слову в строке',
+                             reply_markup=kb.main_menu())
+        return
+    if document.file_size and document.file_size > config.IMPORT_MAX_FILE_SIZE:
+        await message.answer('🛑 Файл слишком большой', reply_markup=kb.main_menu())
+        return
+
+    file = await message.bot.download(document)
+    await import_words(message, file.read().decode('utf-8-sig', errors='replace'))
+
+@router.message(F.text.contains('\n'))
+async def import_list(message: Message) -> None:
+    '''Bulk import of words pasted as a multi-line message'''
+    await import_words(message, message.text)
+
 @router.message(F.content_type == ContentType.TEXT)
 async def handle_word(message: Message, state: FSMContext) -> None:
     '''The main handler. Validates word, fetches data and show buttons'''
     word = await validate_word(message, message.text)
     if not word:
         return
-    
-    tg_id = message.from_user.id
-    word_data: WordData = await rq.get_word_from_db_or_api(tg_id, word)
 
-    if not word_data.transcription and not word_data.example and not word_data.audio_url:
+    # Typos are answered from the local index, without network. Words found
+    # by recent lookups are real even if this process's index misses them
+    suggestions = spelling.typo_suggestions(word) if config.SPELLING_CHECK and not rq.is_known_word(word) else []
+    if suggestions:
+        SPELLING_SUGGESTIONS.labels('shown').inc()
+        await message.answer(
+            f'🤔 Слова <b>{word}</b> нет в моём словаре. Возможно, имелось в виду:',
+            reply_markup=kb.spelling_suggestions(word, suggestions),
+            parse_mode='HTML'
+        )
+        return
+
+    await show_word(message, state, word)
+
+@router.callback_query(kb.SpellingCallback.filter())
+async def choose_spelling(callback: CallbackQuery, callback_data: kb.SpellingCallback, state: FSMContext) -> None:
+    '''Looks up the suggested word or the input as typed'''
+    await callback.answer()
+    SPELLING_SUGGESTIONS.labels('accepted' if callback_data.suggested else 'searched_as_typed').inc()
+    try:
+        await callback.message.edit_reply_markup(reply_markup=None)
+    except TelegramBadRequest:  # second tap on the same suggestions
+        pass
+    await show_word(callback.message, state, callback_data.word)
+
+async def show_word(message: Message, state: FSMContext, word: str) -> None:
+    '''Fetches word data and shows it with buttons'''
+    try:
+        word_data: WordData = await rq.get_word_from_db_or_api(word)
+    except UpstreamUnavailable:
+        await message.answer(WordLookupResult.UNAVAILABLE.value, reply_markup=kb.main_menu())
+        return
+
+    if not word_data.has_details:
         await message.answer(
             f'⚠️ Не удалось найти подробностей по слову <b>{word_data.word}</b>\n\n'
             f'{word_data.translation}',
@@ -170,7 +377,8 @@ async def handle_word(message: Message, state: FSMContext) -> None:
         )
         return
     
-    await state.update_data(word_data=word_data.model_dump())
+    # Only the word is kept in FSM, buttons re-read its data from cache or DB
+    await state.update_data(word=word_data.word)
     await message.answer(
         f"📘 <b>{word_data.word}</b>\n"
         f"🔊 <u>Транскрипция</u>: <b>{word_data.transcription or '-нет транскрипции-'}</b>\n"
@@ -184,8 +392,17 @@ async def send_example(callback: CallbackQuery, state: FSMContext) -> None:
     '''Sends example using in sentences'''
     await callback.answer('🔄 Ищу пример...')
 
-    data = await state.get_data()
-    example = data.get('word_data', {}).get('example')
+    word = await state.get_value('word')
+    if not word:
+        await callback.message.answer(WORD_EXPIRED, reply_markup=kb.main_menu())
+        return
+
+    try:
+        example = await rq.get_word_example(word)  # fetched lazily, only when asked
+    except UpstreamUnavailable:
+        await callback.message.answer('⏳ Сервис примеров сейчас недоступен, попробуй чуть позже',
+                                      reply_markup=kb.main_menu())
+        return
 
     if example:
         await callback.message.answer(f'📖 Пример использования: {example}',
@@ -199,31 +416,46 @@ async def send_audio(callback: CallbackQuery, state: FSMContext) -> None:
     '''Sends pronunciation audio of word'''
     await callback.answer('🔊 Готовлю озвучку...')
 
-    data = await state.get_data()
-    audio_url = data.get('word_data', {}).get('audio_url')
+    word = await state.get_value('word')
+    if not word:
+        await callback.message.answer(WORD_EXPIRED, reply_markup=kb.main_menu())
+        return
 
-    if audio_url:
-        await callback.message.answer_audio(audio_url,
-                                            reply_markup=kb.main_menu())
-    else:
+    try:
+        word_data = await rq.get_word_from_db_or_api(word)
+    except UpstreamUnavailable:
+        await callback.message.answer(WordLookupResult.UNAVAILABLE.value, reply_markup=kb.main_menu())
+        return
+    if not word_data or not word_data.audio_url:
         await callback.message.answer(f'⚠️ Озвучка не найдена',
                                       reply_markup=kb.main_menu())
+        return
+
+    # Already uploaded audio is sent by file_id, without downloading it again
+    if word_data.audio_file_id:
+        try:
+            await callback.message.answer_audio(word_data.audio_file_id,
+                                                reply_markup=kb.main_menu())
+            return
+        except TelegramBadRequest:
+            await rq.save_audio_file_id(word, None)
+
+    sent = await callback.message.answer_audio(word_data.audio_url,
+                                               reply_markup=kb.main_menu())
+    if sent.audio:
+        await rq.save_audio_file_id(word, sent.audio.file_id)
     
 @router.callback_query(F.data == 'add')
 async def add_to_db(callback: CallbackQuery, state: FSMContext) -> None:
     '''Save word data to database'''
-    data = await state.get_data()
-    word_data = data.get('word_data')
+    word = await state.get_value('word')
     tg_id = callback.from_user.id
 
-    added = await rq.add_user_word(
-        tg_id=tg_id,
-        word=word_data['word'],
-        transcription=word_data.get('transcription') or '',
-        translation=word_data.get('translation') or '',
-        example=word_data.get('example') or '',
-        audio_url=word_data.get('audio_url') or ''
-    )
+    if not word:
+        await callback.answer(WORD_EXPIRED, show_alert=True)
+        return
+
+    added = await rq.add_user_word(tg_id=tg_id, word=word)
 
     if added:
         await callback.answer('✅ Слово сохранено!')
@@ -1,12 +1,41 @@
+from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 
-from app.utils import MenuButtons
+from app.utils import MenuButtons, ExportFormat
+from app.utils.quiz import Grade
+
+
+class ExportCallback(CallbackData, prefix='export'):
+    '''Chosen export file format'''
+    fmt: ExportFormat
+    extended: bool = False
+
+
+class WordsPageCallback(CallbackData, prefix='words'):
+    '''Page of "My words": words after or before the word with cursor id'''
+    after: int = 0
+    before: int = 0
+
+
+class QuizCallback(CallbackData, prefix='quiz'):
+    '''Quiz action on the card: show, grade or stop'''
+    action: str
+    card: int = 0
+    grade: int = 0
+
+
+class SpellingCallback(CallbackData, prefix='spell'):
+    '''Word chosen among typo suggestions, or the input itself'''
+    word: str
+    suggested: bool = True
+
 
 def main_menu():
     '''Shows the main control keyboard'''
     return ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text=MenuButtons.MY_WORDS),
+             KeyboardButton(text=MenuButtons.QUIZ),
              KeyboardButton(text=MenuButtons.EXPORT)],
             [KeyboardButton(text=MenuButtons.DELETE_WORD),
              KeyboardButton(text=MenuButtons.CLEAR_DICT),
@@ -49,3 +78,67 @@ def confirm_clear_dict() -> ReplyKeyboardMarkup:
         ],
         resize_keyboard=True
     )
+
+def export_formats() -> InlineKeyboardMarkup:
+    '''Export file formats, second row adds transcription & example'''
+    formats = [(ExportFormat.CSV, MenuButtons.EXPORT_CSV),
+               (ExportFormat.QUIZLET, MenuButtons.EXPORT_QUIZLET),
+               (ExportFormat.ANKI, MenuButtons.EXPORT_ANKI)]
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text=text, callback_data=ExportCallback(fmt=fmt).pack())
+             for fmt, text in formats],
+            [InlineKeyboardButton(text=f'{text} ➕',
+                                  callback_data=ExportCallback(fmt=fmt, extended=True).pack())
+             for fmt, text in formats]
+        ]
+    )
+
+def words_pages(first_id: int, last_id: int, has_prev: bool, has_next: bool) -> InlineKeyboardMarkup | None:
+    '''Navigation between pages of user words'''
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton(text=MenuButtons.PREV_PAGE,
+                                            callback_data=WordsPageCallback(before=first_id).pack()))
+    if has_next:
+        buttons.append(InlineKeyboardButton(text=MenuButtons.NEXT_PAGE,
+                                            callback_data=WordsPageCallback(after=last_id).pack()))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+def quiz_question(card_id: int) -> InlineKeyboardMarkup:
+    '''Reveals translation of the quiz card'''
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text=MenuButtons.QUIZ_SHOW,
+                                  callback_data=QuizCallback(action='show', card=card_id).pack())],
+            [InlineKeyboardButton(text=MenuButtons.QUIZ_STOP,
+                                  callback_data=QuizCallback(action='stop').pack())]
+        ]
+    )
+
+def quiz_grades(card_id: int) -> InlineKeyboardMarkup:
+    '''How well user remembered the word'''
+    grades = [(Grade.AGAIN, MenuButtons.QUIZ_AGAIN), (Grade.HARD, MenuButtons.QUIZ_HARD),
+              (Grade.GOOD, MenuButtons.QUIZ_GOOD), (Grade.EASY, MenuButtons.QUIZ_EASY)]
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text=text,
+                                  callback_data=QuizCallback(action='grade', card=card_id, grade=grade).pack())
+             for grade, text in grades[:2]],
+            [InlineKeyboardButton(text=text,
+                                  callback_data=QuizCallback(action='grade', card=card_id, grade=grade).pack())
+             for grade, text in grades[2:]]
+        ]
+    )
+
+def spelling_suggestions(word: str, suggestions: list[str]) -> InlineKeyboardMarkup:
+    '''Known words close to the input and a way to look the input up anyway'''
+    buttons = [InlineKeyboardButton(text=suggestion, callback_data=SpellingCallback(word=suggestion).pack())
+               for suggestion in suggestions]
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            *(buttons[i:i + 2] for i in range(0, len(buttons), 2)),
+            [InlineKeyboardButton(text=MenuButtons.SEARCH_AS_TYPED,
+                                  callback_data=SpellingCallback(word=word, suggested=False).pack())]
+        ]
+    )
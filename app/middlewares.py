@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import TelegramObject, Update
+
+from app.config import config
+from app.utils.metrics import HANDLER_LATENCY, UPDATES_DROPPED, UPDATES_IN_PROGRESS, UPDATES_QUEUED
+
+
+logger = logging.getLogger(__name__)
+
+
+class UpdatesInProgressMiddleware(BaseMiddleware):
+    '''Outer update middleware: counts updates being processed'''
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any]
+            ) -> Any:
+        with UPDATES_IN_PROGRESS.track_inprogress():
+            return await handler(event, data)
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    '''Inner middleware: latency histogram per router handler'''
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any]
+            ) -> Any:
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            name = data['handler'].callback.__name__ if 'handler' in data else 'unknown'
+            HANDLER_LATENCY.labels(name).observe(time.perf_counter() - start)
+
+
+class ChatOrderMiddleware(BaseMiddleware):
+    '''
+    Outer update scheduler: updates of one chat run strictly one by one in arrival order,
+    different chats run in parallel up to `concurrency`. Updates over the queue limits
+    are dropped, so a flood can't grow memory without bound.
+    Must run before FSM middleware, which reads the chat state.
+    '''
+    def __init__(
+            self,
+            concurrency: int = config.UPDATES_CONCURRENCY,
+            queue_limit: int = config.UPDATES_QUEUE_LIMIT,
+            chat_queue_limit: int = config.UPDATES_CHAT_QUEUE_LIMIT
+            ):
+        self.queue_limit = queue_limit
+        self.chat_queue_limit = chat_queue_limit
+        self.queued = 0
+        self.dropped: Counter[str] = Counter()  # reason -> number of updates
+        self._slots = asyncio.Semaphore(concurrency)
+        self._chats: dict[int, tuple[asyncio.Lock, int]] = {}  # lock & number of chat updates
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any]
+            ) -> Any:
+        chat = data.get('event_chat')
+        if chat is None:
+            async with self._slots:
+                return await handler(event, data)
+
+        if self.queued >= self.queue_limit:
+            return self._drop(event, 'overload')
+        lock, count = self._chats.get(chat.id, (None, 0))
+        if count >= self.chat_queue_limit:
+            return self._drop(event, 'chat_flood')
+        lock = lock or asyncio.Lock()
+        self._chats[chat.id] = (lock, count + 1)
+
+        self._set_queued(+1)
+        waiting = True
+        try:
+            async with lock:  # asyncio.Lock wakes waiters in FIFO order
+                async with self._slots:
+                    waiting = False
+                    self._set_queued(-1)
+                    return await handler(event, data)
+        finally:
+            if waiting:  # cancelled while queued
+                self._set_queued(-1)
+            lock, count = self._chats[chat.id]
+            if count > 1:
+                self._chats[chat.id] = (lock, count - 1)
+            else:
+                del self._chats[chat.id]
+
+    def _set_queued(self, delta: int) -> None:
+        self.queued += delta
+        UPDATES_QUEUED.inc(delta)
+
+    def _drop(self, event: Update, reason: str) -> Any:
+        logger.warning('Update dropped', extra={'reason': reason, 'update_id': event.update_id,
+                                                'queued': self.queued})
+        UPDATES_DROPPED.labels(reason).inc()
+        self.dropped[reason] += 1
+        return UNHANDLED
@@ -1,4 +1,4 @@
 from .validators import validate_word
-from .dictionary import DictionaryAPI, WordData
-from .csv_export import export_to_csv
+from .dictionary import DictionaryAPI, WordData, word_cache
+from .export import ExportFormat, WordsExportFile
 from .constants import MenuButtons
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+
+from app.config import config
+from app.database.db_requests import get_entries_without_audio_file, save_audio_file_id
+
+
+logger = logging.getLogger(__name__)
+
+
+async def preload_audio(bot: Bot, chat_id: int, limit: int) -> int:
+    '''
+    Uploads audio of the most saved words to the service chat and remembers
+    their file_id, so users get audio instantly. Returns number of uploaded files
+    '''
+    uploaded = 0
+    for word, audio_url in await get_entries_without_audio_file(limit):
+        try:
+            message = await bot.send_audio(chat_id, audio_url, disable_notification=True)
+        except TelegramAPIError as e:
+            logger.warning('Audio preload failed', extra={'word': word, 'error': repr(e)})
+            continue
+
+        if message.audio:
+            await save_audio_file_id(word, message.audio.file_id)
+            uploaded += 1
+        try:
+            await bot.delete_message(chat_id, message.message_id)
+        except TelegramAPIError as e:  # file_id is saved, the message is just left in the chat
+            logger.warning('Audio preload message not deleted', extra={'word': word, 'error': repr(e)})
+    return uploaded
+
+
+async def run_audio_preload(bot: Bot, chat_id: int = config.AUDIO_PRELOAD_CHAT_ID,
+                            interval: int = config.AUDIO_PRELOAD_INTERVAL,
+                            limit: int = config.AUDIO_PRELOAD_BATCH) -> None:
+    '''Background job, enabled by AUDIO_PRELOAD_CHAT_ID'''
+    while True:
+        try:
+            uploaded = await preload_audio(bot, chat_id, limit)
+            logger.info('Audio preloaded', extra={'uploaded': uploaded})
+        except Exception:
+            logger.exception('Audio preload error')
+        await asyncio.sleep(interval)
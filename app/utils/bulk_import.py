@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import re
+from typing import Awaitable, Callable
+
+from app.config import config
+from app.database.db_requests import get_word_from_db_or_api
+from app.utils.constants import ValidationResult
+from app.utils.resilience import UpstreamUnavailable
+from app.utils.validators import WordValidator
+
+
+logger = logging.getLogger(__name__)
+
+SEPARATORS = re.compile(r'[,;\t]')
+
+
+def parse_words(text: str) -> tuple[list[str], list[str]]:
+    '''
+    Splits pasted list or file content into valid unique words and invalid entries.
+    One word per line; for csv-like lines the first column is taken.
+    '''
+    words, invalid = {}, []
+    for line in text.splitlines():
+        entry = SEPARATORS.split(line, maxsplit=1)[0].strip().strip('"\'')
+        if not entry:
+            continue
+        if WordValidator(entry).validate() == ValidationResult.VALID:
+            words.setdefault(entry.lower(), None)
+        else:
+            invalid.append(entry)
+    return list(words), invalid
+
+
+async def resolve_words(
+        words: list[str],
+        on_progress: Callable[[int], Awaitable[None]] | None = None,
+        concurrency: int = config.IMPORT_CONCURRENCY
+        ) -> tuple[list[str], list[str], list[str]]:
+    '''
+    Looks words up by a bounded pool of workers, so upstream APIs get
+    at most `concurrency` requests at once. Returns found, not found words
+    and words that couldn't be checked because upstream was unavailable.
+    '''
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for word in words:
+        queue.put_nowait(word)
+
+    found, not_found, failed = [], [], []
+
+    async def worker() -> None:
+        while True:
+            try:
+                word = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                word_data = await get_word_from_db_or_api(word)
+            except UpstreamUnavailable:
+                failed.append(word)
+            except Exception:
+                logger.exception('Word import failed', extra={'word': word})
+                failed.append(word)
+            else:
+                (found if word_data and word_data.has_details else not_found).append(word)
+            if on_progress:
+                await on_progress(len(found) + len(not_found) + len(failed))
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(words)))))
+    return found, not_found, failed
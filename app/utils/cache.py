@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable
+
+
+@dataclass
+class CacheStats:
+    '''Counters of cache usage'''
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class TTLCache:
+    '''
+    Bounded in-memory cache with LRU eviction.
+    Every value expires after its own TTL, so hits and misses can live differently.
+    '''
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any | None:
+        '''Returns cached value or None if absent or expired'''
+        item = self._data.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return None
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.stats.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        '''Stores value, evicting the least recently used ones over the limit'''
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        '''Drops the key if it is cached'''
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        '''Drops all values, counters are kept'''
+        self._data.clear()
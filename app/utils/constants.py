@@ -20,3 +20,16 @@ class MenuButtons(str, Enum):
     ADD: str = '🟢 Добавить в словарь'
     EXAMPLE: str = '📝 Пример'
     AUDIO: str = '🗣️ Озвучка'
+    EXPORT_CSV: str = '📄 CSV'
+    EXPORT_QUIZLET: str = '🟦 Quizlet'
+    EXPORT_ANKI: str = '🃏 Anki'
+    PREV_PAGE: str = '⬅️ Назад'
+    NEXT_PAGE: str = 'Вперёд ➡️'
+    QUIZ: str = '🧠 Тренировка'
+    QUIZ_SHOW: str = '👀 Показать перевод'
+    QUIZ_AGAIN: str = '❌ Не помню'
+    QUIZ_HARD: str = '😓 Трудно'
+    QUIZ_GOOD: str = '🙂 Хорошо'
+    QUIZ_EASY: str = '😎 Легко'
+    QUIZ_STOP: str = '🏁 Закончить'
+    SEARCH_AS_TYPED: str = '🔎 Искать как написано'
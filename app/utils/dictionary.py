@@ -1,15 +1,24 @@
+import asyncio
+import logging
+import time
 import aiohttp
 from pydantic import BaseModel
-from googletrans import Translator
 from enum import Enum
 
 from app.config import config
+from app.utils.cache import TTLCache
+from app.utils.http_client import get_http_session
+from app.utils.logger import log_body
+from app.utils.metrics import UPSTREAM_LATENCY
+from app.utils.resilience import RETRYABLE_STATUSES, UpstreamUnavailable, providers
+from app.utils.translator import translation_batcher
 
 
 class WordLookupResult(Enum):
     '''Results answers after checkup the word'''
     WIKI = '🤔 Возможно, это имя собственное. Попробуй прочитать об этом в Википедии:\n{}'
     NOT_FOUND = '❌ Возможно, это слово не существует. Проверь ввод и попробуй снова.'
+    UNAVAILABLE = '⏳ Словарь сейчас недоступен. Попробуй ещё раз чуть позже.'
 
 
 class WordData(BaseModel):
@@ -19,56 +28,109 @@ class WordData(BaseModel):
     translation: str | None = None
     example: str | None = None
     audio_url: str | None = None
+    audio_file_id: str | None = None
+
+    @property
+    def has_details(self) -> bool:
+        '''False for NOT_FOUND / WIKI answers, which carry only a message'''
+        return bool(self.transcription or self.example or self.audio_url)
+
+
+logger = logging.getLogger(__name__)
+
+# Lookups cache shared by all users: popular words & typos skip the network
+word_cache = TTLCache(maxsize=config.WORD_CACHE_SIZE, ttl=config.WORD_CACHE_TTL)
 
 
 class DictionaryAPI:
     def __init__(self, word: str):
         self.word = word.lower()
-        self.dictionary_url = f'https://api.dictionaryapi.dev/api/v2/entries/en/{self.word}'
-        self.translator = Translator()
-        self.twinword_url = f'https://twinword-word-graph-dictionary.p.rapidapi.com/example/?entry={self.word}'
+        self.dictionary_url = f'{config.DICTIONARY_API_URL}/{self.word}'
+        self.twinword_url = f'{config.TWINWORD_API_URL}/example/?entry={self.word}'
         self.twinword_key = config.TWINWORD_API_KEY
 
-    async def _get_json(self, url: str, method: str = 'GET', payload: dict | None = None,
-                        headers: dict | None = None) -> dict | None:
-        '''Generic HTTP request and getting data in JSON'''
-        async with aiohttp.ClientSession() as session:
+    async def _fetch(self, provider: str, url: str, budget: float, method: str = 'GET',
+                     payload: dict | None = None, headers: dict | None = None,
+                     read_json: bool = True) -> tuple[int | None, dict | None]:
+        '''
+        HTTP request to the provider under its rate limit and circuit breaker.
+        Retries 429/5xx & network errors with backoff within `budget` seconds,
+        returns (status, JSON body). Every attempt times out when the budget
+        is spent, so a hung upstream fails the call and counts for the breaker.
+        The budget starts once the rate limiter lets the first attempt through:
+        waiting in our own queue says nothing about the upstream.
+        Raises UpstreamUnavailable when there is no answer
+        '''
+        upstream = providers[provider]
+        if not upstream.allow():
+            logger.warning('Provider is unavailable, request skipped', extra={'provider': provider, 'url': url})
+            raise UpstreamUnavailable(provider)
+
+        session = get_http_session()
+        deadline = None
+        for attempt in range(upstream.retries + 1):
+            await upstream.throttle()
+            if deadline is None:
+                deadline = time.monotonic() + budget
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            timeout = aiohttp.ClientTimeout(total=min(remaining, config.HTTP_TIMEOUT),
+                                            connect=config.HTTP_CONNECT_TIMEOUT)
+            retry_after = None
+            status = 'error'
+            start = time.perf_counter()
             try:
-                async with session.request(method, url, json=payload, headers=headers) as resp:
-                    text = await resp.text()
-                    print(f"\n🟡 Запрос: {method} {url}")
-                    if payload:
-                        print(f"📦 Payload: {payload}")
-                    print(f"🔵 Статус: {resp.status}")
-                    print(f"🟠 Ответ (текст): {text}")
-                    if resp.status == 200:
-                        return await resp.json()
-            except aiohttp.ClientError as e:
-                print(f"🔴 aiohttp ошибка: {e}")
-        return None
+                async with session.request(method, url, json=payload, headers=headers, timeout=timeout) as resp:
+                    status = resp.status
+                    logger.debug('API request', extra={'provider': provider, 'method': method,
+                                                       'url': url, 'status': status})
+                    if resp.status not in RETRYABLE_STATUSES:
+                        upstream.record_success()
+                        if resp.status == 200 and read_json:
+                            data = await resp.json()  # body is read & parsed once
+                            log_body(logger, 'API response', data, provider=provider, url=url)
+                            return resp.status, data
+                        return resp.status, None
+                    retry_after = resp.headers.get('Retry-After')
+                    logger.warning('API returned an error', extra={'provider': provider, 'url': url,
+                                                                   'status': status, 'attempt': attempt})
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning('API request failed', extra={'provider': provider, 'url': url,
+                                                            'error': repr(e), 'attempt': attempt})
+            except asyncio.CancelledError:
+                status = 'cancelled'
+                raise
+            finally:
+                UPSTREAM_LATENCY.labels(provider, str(status)).observe(time.perf_counter() - start)
+
+            if attempt < upstream.retries:
+                await upstream.backoff(attempt, retry_after, limit=deadline - time.monotonic())
+
+        upstream.record_failure()
+        raise UpstreamUnavailable(provider)
+
+    async def _get_json(self, url: str, provider: str, budget: float, method: str = 'GET',
+                        payload: dict | None = None, headers: dict | None = None) -> dict | None:
+        '''Generic HTTP request and getting data in JSON'''
+        status, data = await self._fetch(provider, url, budget, method, payload, headers)
+        return data if status == 200 else None
 
-    async def _check_wiki_url(self, url: str) -> bool:
-        '''Check if Wikipedia article exists for the word'''
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url) as resp:
-                    return resp.status == 200
-            except aiohttp.ClientError:
-                return False
+    async def _check_wiki_url(self, url: str) -> bool | None:
+        '''Check if Wikipedia article exists for the word, None if Wikipedia is unavailable'''
+        try:
+            status, _ = await self._fetch('wiki', url, config.WIKI_TIMEOUT, read_json=False)
+        except UpstreamUnavailable:
+            return None
+        return status == 200
 
     async def get_word_data(self) -> dict | None:
         '''Get word data from dictionaryapi.dev'''
-        return await self._get_json(self.dictionary_url)
+        return await self._get_json(self.dictionary_url, 'dictionary', config.DICTIONARY_TIMEOUT)
 
     async def get_word_translation(self) -> str | None:
-        '''Use "googletrans" library to translate word'''
-        try:
-            result = await self.translator.translate(self.word, src='en', dest='ru')
-            print(f"🔵 Перевод с Google Translate: {result.text}")
-            return result.text
-        except Exception as e:
-            print(f"🔴 Ошибка перевода: {e}")
-            return None
+        '''Use "googletrans" library to translate word, batched with concurrent lookups'''
+        return await translation_batcher.translate(self.word)
 
     async def get_example_from_twinword(self) -> str | None:
         '''Fallback: Get example sentence from Twinword API if there is no via dictionaryapi.dev'''
@@ -76,13 +138,21 @@ class DictionaryAPI:
             'X-RapidAPI-Key': self.twinword_key,
             'X-RapidAPI-Host': 'twinword-word-graph-dictionary.p.rapidapi.com'
         }
-        data = await self._get_json(self.twinword_url, headers=headers)
+        data = await self._get_json(self.twinword_url, 'twinword', config.EXAMPLE_TIMEOUT, headers=headers)
         if data and 'example' in data:
             examples = data['example']
             if isinstance(examples, list) and examples:
                 return examples[0]
         return None
 
+    async def get_translation(self) -> str | None:
+        '''Translation alone, for entries saved while the translator was failing'''
+        return await self._within(self.get_word_translation(), config.TRANSLATION_TIMEOUT, 'translation')
+
+    async def get_example(self) -> str | None:
+        '''Example on demand, when the user asks for it: Twinword API with own timeout'''
+        return await self.get_example_from_twinword()
+
     def _parse_phonetics(self, data: dict) -> tuple[str | None, str | None]:
         '''Parse transcription & audio_url from dictionaryapi.dev's data'''
         phonetics = data.get('phonetics', [])
@@ -110,17 +180,38 @@ class DictionaryAPI:
                     return example
         return None
 
+    async def _within(self, coro, timeout: float, branch: str):
+        '''Awaits a branch that isn't an HTTP call of its own, returns None if it is too slow'''
+        try:
+            return await asyncio.wait_for(coro, timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Request timed out', extra={'branch': branch, 'word': self.word})
+            return None
+
     async def get_word_full_data(self) -> WordData | None:
         '''
         Returns dict includes word's transcription, translation, example & audio link.
         Returns wiki-link for proper nouns if link exists,
         otherwise says word probably doesn't exist.
+        Translation runs alongside the dictionary request, so a slow translator
+        only loses its own part of the result. Wikipedia is checked only on
+        a dictionary miss, most words never need it. Missing example is left None and fetched on demand via get_example().
+        Raises UpstreamUnavailable if it can't tell whether the word exists.
         '''
-        data = await self.get_word_data()
+        translation_task = asyncio.create_task(self.get_translation())
+        try:
+            data = await self.get_word_data()
+        except BaseException:
+            translation_task.cancel()
+            raise
 
         if not data or not isinstance(data, list):
-            wiki_url = f'https://en.wikipedia.org/wiki/{self.word.capitalize()}'
-            if await self._check_wiki_url(wiki_url):
+            translation_task.cancel()  # not needed for unknown words
+            wiki_url = f'{config.WIKI_URL}/{self.word.capitalize()}'
+            wiki_exists = await self._check_wiki_url(wiki_url)
+            if wiki_exists is None:
+                raise UpstreamUnavailable('wiki')
+            if wiki_exists:
                 return WordData(
                     word=self.word,
                     translation=WordLookupResult.WIKI.value.format(wiki_url)
@@ -134,11 +225,8 @@ class DictionaryAPI:
 
         transcription, audio_url = self._parse_phonetics(data)
         example = self._parse_example(data)
-       
-        if not example:  # fallback via TwinwordAPI
-            example = await self.get_example_from_twinword()
 
-        translation = await self.get_word_translation()
+        translation = await translation_task
 
         return WordData(
             word=self.word,
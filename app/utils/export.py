@@ -0,0 +1,93 @@
+import csv
+import io
+from enum import Enum
+from typing import AsyncGenerator
+
+from aiogram import Bot
+from aiogram.types import InputFile
+
+from app.database.db_requests import stream_user_words
+
+
+class ExportFormat(str, Enum):
+    '''Supported dictionary file formats'''
+    CSV = 'csv'
+    QUIZLET = 'quizlet'  # quizlet.com import: term <tab> definition, one per line
+    ANKI = 'anki'  # Anki plain text import with header directives
+
+
+EXPORT_FILENAMES = {
+    ExportFormat.CSV: 'my_words.csv',
+    ExportFormat.QUIZLET: 'my_words_quizlet.txt',
+    ExportFormat.ANKI: 'my_words_anki.txt',
+}
+
+
+def _clean(value: str | None) -> str:
+    '''Tabs & line breaks would break rows in tab-separated formats'''
+    return ' '.join((value or '').split())
+
+
+class WordsExportFile(InputFile):
+    '''
+    User dictionary rendered on the fly while uploading to Telegram.
+    Rows come from a DB cursor and are encoded in chunks,
+    so memory doesn't grow with dictionary size.
+    '''
+    def __init__(self, tg_id: int, fmt: ExportFormat, extended: bool = False):
+        super().__init__(filename=EXPORT_FILENAMES[fmt])
+        self.tg_id = tg_id
+        self.fmt = fmt
+        self.extended = extended
+
+    def _header(self) -> list[list[str]]:
+        '''Rows written before the words'''
+        if self.fmt == ExportFormat.CSV:
+            columns = ['Слово', 'Перевод']
+            if self.extended:
+                columns += ['Транскрипция', 'Пример']
+            return [columns]
+        if self.fmt == ExportFormat.ANKI:
+            return [['#separator:tab'], ['#html:false']]
+        return []
+
+    def _row(self, word: str, translation: str | None,
+             transcription: str | None = None, example: str | None = None) -> list[str]:
+        '''Renders one word according to format'''
+        if self.fmt == ExportFormat.CSV:
+            row = [word, translation or '']
+            if self.extended:
+                row += [transcription or '', example or '']
+            return row
+
+        if self.fmt == ExportFormat.QUIZLET:
+            # Quizlet has only term & definition, extra data goes to definition
+            definition = _clean(translation)
+            if self.extended and transcription:
+                definition = f'{_clean(transcription)} {definition}'
+            if self.extended and example:
+                definition = f'{definition} — {_clean(example)}'
+            return [word, definition]
+
+        row = [word, _clean(translation)]
+        if self.extended:
+            row += [_clean(transcription), _clean(example)]
+        return row
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        buffer = io.StringIO()
+        if self.fmt == ExportFormat.CSV:
+            writer = csv.writer(buffer)
+        else:
+            writer = csv.writer(buffer, delimiter='\t', quoting=csv.QUOTE_NONE,
+                                quotechar=None, lineterminator='\n')
+        writer.writerows(self._header())
+
+        async for rows in stream_user_words(self.tg_id, extended=self.extended):
+            writer.writerows(self._row(*row) for row in rows)
+            if buffer.tell() >= self.chunk_size:
+                yield buffer.getvalue().encode('UTF-8')
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue().encode('UTF-8')
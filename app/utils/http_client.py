@@ -0,0 +1,39 @@
+import aiohttp
+
+from app.config import config
+
+
+_session: aiohttp.ClientSession | None = None
+
+
+async def start_http_session() -> aiohttp.ClientSession:
+    '''Creates application-wide HTTP session with pooled keep-alive connections'''
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=config.HTTP_LIMIT,
+            limit_per_host=config.HTTP_LIMIT_PER_HOST,
+            ttl_dns_cache=config.HTTP_DNS_TTL,
+            keepalive_timeout=config.HTTP_KEEPALIVE
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=config.HTTP_TIMEOUT,
+            connect=config.HTTP_CONNECT_TIMEOUT
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _session
+
+
+async def close_http_session() -> None:
+    '''Closes shared HTTP session and its connections'''
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    '''Returns shared HTTP session, it must be started in main()'''
+    if _session is None or _session.closed:
+        raise RuntimeError('HTTP session is not started, call start_http_session() first')
+    return _session
@@ -0,0 +1,71 @@
+import copy
+import json
+import logging
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+from app.config import config
+
+
+# Attributes every LogRecord has, everything else came via `extra`
+STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    '''One JSON object per line: time, level, logger, message & extra fields'''
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in STANDARD_ATTRS})
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RecordQueueHandler(QueueHandler):
+    '''
+    Enqueues records with exception info intact: the default prepare() formats
+    the traceback into the message and drops exc_info, so "exc" would never be set
+    '''
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()  # args may not outlive the call
+        record.args = None
+        return record
+
+
+def setup_logging(level: str = config.LOG_LEVEL) -> QueueListener:
+    '''
+    Routes all logs through a queue: the event loop only enqueues records,
+    formatting and stdout writes happen in the listener thread.
+    The listener must be stopped on shutdown to flush the queue.
+    '''
+    queue = SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    listener = QueueListener(queue, stream, respect_handler_level=True)
+    listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [RecordQueueHandler(queue)]
+    root.setLevel(level.upper())
+    return listener
+
+
+def log_body(logger: logging.Logger, message: str, body, **fields) -> None:
+    '''
+    Debug dump of upstream response: opt-in by LOG_BODIES,
+    sampled by LOG_BODY_SAMPLE_RATE and cut to LOG_BODY_MAX_CHARS
+    '''
+    if not config.LOG_BODIES or not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= config.LOG_BODY_SAMPLE_RATE:
+        return
+    text = json.dumps(body, ensure_ascii=False, default=str)
+    logger.debug(message, extra={**fields, 'body': text[:config.LOG_BODY_MAX_CHARS]})
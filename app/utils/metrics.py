@@ -0,0 +1,82 @@
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+HANDLER_LATENCY = Histogram(
+    'bot_handler_duration_seconds', 'Time spent in router handler', ['handler']
+)
+UPSTREAM_LATENCY = Histogram(
+    'bot_upstream_request_duration_seconds', 'Outbound API call duration', ['provider', 'status'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2.5, 5, 10)
+)
+DB_ACQUIRE_LATENCY = Histogram(
+    'bot_db_connection_acquire_seconds', 'Time waiting for a connection from SQLAlchemy pool',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+UPDATES_IN_PROGRESS = Gauge(
+    'bot_updates_in_progress', 'Telegram updates being processed right now'
+)
+UPDATES_QUEUED = Gauge(
+    'bot_updates_queued', 'Telegram updates waiting for their chat or a free processing slot'
+)
+UPDATES_DROPPED = Counter(
+    'bot_updates_dropped', 'Telegram updates shed under overload', ['reason']
+)
+SPELLING_SUGGESTIONS = Counter(
+    'bot_spelling_suggestions', 'Typo suggestions shown instead of a lookup and what users chose', ['action']
+)
+WORKER_UP = Gauge(
+    'bot_worker_up', 'Worker process is alive, exported by the front', ['worker']
+)
+STARTUP_PHASE = Gauge(
+    'bot_startup_phase_seconds', 'Duration of the last startup by phase', ['phase']
+)
+
+
+class StatsCollector:
+    '''Exposes counters kept by the bot itself: pools, word cache and outbound providers'''
+    def __init__(self, engines, word_cache, providers):
+        self.engines = engines
+        self.word_cache = word_cache
+        self.providers = providers
+
+    def collect(self):
+        gauges = {name: GaugeMetricFamily(f'bot_db_pool_{name}', f'SQLAlchemy pool {name} connections',
+                                          labels=['role'])
+                  for name in ('checked_out', 'overflow', 'size', 'checked_in')}
+        for role, engine in self.engines.items():
+            pool = engine.pool
+            for name, value in (('checked_out', pool.checkedout()), ('overflow', max(pool.overflow(), 0)),
+                                ('size', pool.size()), ('checked_in', pool.checkedin())):
+                gauges[name].add_metric([role], value)
+        yield from gauges.values()
+
+        stats = self.word_cache.stats
+        cache = CounterMetricFamily('bot_word_cache', 'Word cache usage', labels=['result'])
+        for result in ('hits', 'misses', 'evictions'):
+            cache.add_metric([result], getattr(stats, result))
+        yield cache
+        yield GaugeMetricFamily('bot_word_cache_size', 'Words in cache', value=len(self.word_cache))
+
+        calls = CounterMetricFamily('bot_upstream_calls', 'Outbound API calls by outcome', labels=['provider', 'kind'])
+        throttle_wait = CounterMetricFamily('bot_upstream_throttle_wait_seconds',
+                                            'Time spent waiting for rate limiter', labels=['provider'])
+        trips = CounterMetricFamily('bot_upstream_breaker_trips', 'Circuit breaker trips', labels=['provider'])
+        breaker_open = GaugeMetricFamily('bot_upstream_breaker_open', '1 while breaker is open', labels=['provider'])
+        for name, provider in self.providers.items():
+            for kind in ('requests', 'retries', 'failures', 'rejected', 'throttled'):
+                calls.add_metric([name, kind], getattr(provider.stats, kind))
+            throttle_wait.add_metric([name], provider.stats.throttle_wait)
+            trips.add_metric([name], provider.breaker.trips)
+            breaker_open.add_metric([name], int(provider.breaker.is_open))
+        yield from (calls, throttle_wait, trips, breaker_open)
+
+
+def register_stats(engines, word_cache, providers) -> None:
+    '''Adds bot counters to Prometheus registry, `engines` are keyed by role'''
+    REGISTRY.register(StatsCollector(engines, word_cache, providers))
+
+
+def render_metrics() -> tuple[bytes, str]:
+    '''Returns metrics in Prometheus text format and its content type'''
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
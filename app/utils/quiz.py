@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from enum import IntEnum
+
+from sqlalchemy import Row
+
+from app.config import config
+from app.database.db_requests import get_due_cards, get_quiz_card, save_reviews
+from app.utils.cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class Grade(IntEnum):
+    '''SM-2 answer quality offered to user'''
+    AGAIN = 1
+    HARD = 3
+    GOOD = 4
+    EASY = 5
+
+
+def schedule(card: Row, grade: int, now: datetime | None = None) -> dict:
+    '''
+    SM-2: returns new review state of the card after the answer.
+    Forgotten cards start over and come back after QUIZ_RELEARN_DELAY
+    '''
+    now = now or datetime.now(timezone.utc)
+    ease = max(1.3, card.ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+
+    if grade < Grade.HARD:
+        return {'due_at': now + timedelta(seconds=config.QUIZ_RELEARN_DELAY),
+                'interval_days': 0, 'ease': ease, 'repetitions': 0}
+
+    repetitions = card.repetitions + 1
+    if repetitions == 1:
+        interval = 1
+    elif repetitions == 2:
+        interval = 6
+    else:
+        interval = round(card.interval_days * card.ease)
+    return {'due_at': now + timedelta(days=interval),
+            'interval_days': interval, 'ease': ease, 'repetitions': repetitions}
+
+
+class ReviewBuffer:
+    '''
+    Write-behind buffer of answers: reviews are kept in memory and written
+    by one executemany every QUIZ_FLUSH_INTERVAL seconds or QUIZ_FLUSH_SIZE answers
+    '''
+    def __init__(self, flush_size: int = config.QUIZ_FLUSH_SIZE):
+        self.flush_size = flush_size
+        self.pending: dict[int, dict] = {}
+        self._in_flight: dict[int, dict] = {}
+        self._owners: dict[int, int] = {}  # card id -> user id of unsaved reviews
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def add(self, tg_id: int, card_id: int, review: dict) -> None:
+        '''Records the answer, the newest review of a card wins'''
+        self.pending[card_id] = review
+        self._owners[card_id] = tg_id
+        if len(self.pending) >= self.flush_size:
+            self._full.set()
+
+    def unsaved_cards(self, tg_id: int) -> set[int]:
+        '''Cards the user answered, but DB doesn't know it yet'''
+        return {card_id for card_id, owner in self._owners.items() if owner == tg_id}
+
+    async def flush(self) -> int:
+        '''Writes pending reviews, returns their count. Failed ones are retried next time'''
+        async with self._lock:
+            reviews, self.pending = self.pending, {}
+            self._full.clear()
+            if not reviews:
+                return 0
+            self._in_flight = reviews
+            try:
+                await save_reviews(reviews)
+            except BaseException:  # cancellation included, nothing is lost
+                self.pending = reviews | self.pending
+                raise
+            finally:
+                self._in_flight = {}
+            for card_id in reviews.keys() - self.pending.keys():  # answered again meanwhile stay unsaved
+                del self._owners[card_id]
+            return len(reviews)
+
+    async def run_flushing(self, interval: float = config.QUIZ_FLUSH_INTERVAL) -> None:
+        '''Background loop, the last flush happens on cancellation'''
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception('Saving quiz reviews failed', extra={'pending': len(self.pending)})
+        finally:
+            await self.flush()
+
+
+class Quiz:
+    '''
+    Quiz sessions: due cards of a user are loaded by one query and kept in memory,
+    so a session makes no upstream calls and one DB read per batch
+    '''
+    def __init__(self, reviews: ReviewBuffer, batch_size: int = config.QUIZ_BATCH_SIZE):
+        self.reviews = reviews
+        self.batch_size = batch_size
+        self._decks = TTLCache(maxsize=10_000, ttl=3600)
+
+    async def next_card(self, tg_id: int) -> Row | None:
+        '''Returns the card to ask, loads a new batch when the deck is over'''
+        deck: deque[Row] | None = self._decks.get(tg_id)
+        if not deck:
+            # Answered but not yet flushed cards are still due in DB
+            unsaved = self.reviews.unsaved_cards(tg_id)
+            rows = await get_due_cards(tg_id, self.batch_size + len(unsaved))
+            deck = deque(row for row in rows if row.id not in unsaved)
+            while len(deck) > self.batch_size:
+                deck.pop()
+            self._decks.set(tg_id, deck)
+        return deck[0] if deck else None
+
+    async def answer(self, tg_id: int, card_id: int, grade: int) -> Row | None:
+        '''Schedules the card by the answer and returns it, None if the word was deleted'''
+        deck: deque[Row] = self._decks.get(tg_id) or deque()
+        card = next((row for row in deck if row.id == card_id), None)
+        if card:
+            deck.remove(card)
+        else:  # session was lost by restart or expiry
+            card = await get_quiz_card(tg_id, card_id)
+            if card is None:
+                return None
+
+        self.reviews.add(tg_id, card_id, schedule(card, grade))
+        return card
+
+    def stop(self, tg_id: int) -> None:
+        self._decks.pop(tg_id)
+
+
+review_buffer = ReviewBuffer()
+quiz = Quiz(review_buffer)
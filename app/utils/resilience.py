@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+
+from app.config import config
+
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth another attempt: throttling & upstream hiccups
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UpstreamUnavailable(Exception):
+    '''Provider failed after retries or its breaker is open: the answer is unknown, not negative'''
+    def __init__(self, provider: str):
+        super().__init__(f'{provider} is unavailable')
+        self.provider = provider
+
+
+class TokenBucket:
+    '''Rate limiter: `rate` requests per second with bursts up to `capacity`'''
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        '''Waits for a free token, returns seconds spent waiting'''
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+
+                delay = (1 - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    '''
+    Fails fast while provider is down: opens after `failure_threshold` failures
+    in a row, lets one probe request through after `reset_timeout` seconds
+    and closes again when the probe succeeds.
+    '''
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trips = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        '''Checks if request may go to provider'''
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.opened_at = time.monotonic()  # only one probe per reset_timeout
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.opened_at is not None:  # probe failed, stay open
+            self.opened_at = time.monotonic()
+        elif self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            logger.error('Circuit breaker tripped', extra={'provider': self.name, 'failures': self.failures})
+
+
+@dataclass
+class ProviderStats:
+    '''Counters of outbound calls to one provider'''
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    rejected: int = 0  # not sent because breaker is open
+    throttled: int = 0  # requests that waited for rate limiter
+    throttle_wait: float = 0.0
+
+
+class Provider:
+    '''Upstream API with its own rate limit, retry policy and circuit breaker'''
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(name, config.BREAKER_FAILURES, config.BREAKER_RESET_TIMEOUT)
+        self.retries = config.HTTP_RETRIES
+        self.stats = ProviderStats()
+
+    def allow(self) -> bool:
+        '''False while breaker is open, the call should fail fast'''
+        if self.breaker.allow():
+            return True
+        self.stats.rejected += 1
+        return False
+
+    async def throttle(self) -> None:
+        '''Waits for rate limiter before each attempt'''
+        waited = await self.bucket.acquire()
+        self.stats.requests += 1
+        if waited:
+            self.stats.throttled += 1
+            self.stats.throttle_wait += waited
+
+    async def backoff(self, attempt: int, retry_after: str | None = None, limit: float | None = None) -> None:
+        '''
+        Sleeps before retry: Retry-After if upstream sent it, otherwise jittered
+        exponential delay. Never longer than `limit`, the time left for the call
+        '''
+        self.stats.retries += 1
+        delay = min(config.RETRY_BACKOFF_MAX, config.RETRY_BACKOFF * 2 ** attempt)
+        if retry_after and retry_after.isdigit():
+            delay = min(config.RETRY_BACKOFF_MAX, float(retry_after))
+        else:
+            delay = random.uniform(delay / 2, delay)
+        if limit is not None:
+            delay = max(0.0, min(delay, limit))
+        await asyncio.sleep(delay)
+
+    def record_success(self) -> None:
+        self.breaker.record_success()
+
+    def record_failure(self) -> None:
+        self.stats.failures += 1
+        self.breaker.record_failure()
+
+
+providers = {
+    'dictionary': Provider('dictionary', config.DICTIONARY_RATE, config.DICTIONARY_BURST),
+    'twinword': Provider('twinword', config.TWINWORD_RATE, config.TWINWORD_BURST),
+    'translate': Provider('translate', config.TRANSLATE_RATE, config.TRANSLATE_BURST),
+    'wiki': Provider('wiki', config.WIKI_RATE, config.WIKI_BURST),
+}
+
+
+def split_limits(parts: int) -> None:
+    '''Each of `parts` worker processes gets its share of providers rate limits'''
+    for provider in providers.values():
+        bucket = provider.bucket
+        provider.bucket = TokenBucket(bucket.rate / parts, max(1, bucket.capacity // parts))
@@ -0,0 +1,34 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    '''
+    Coalesces concurrent calls with the same key into one shared task.
+    All callers get the same result or exception; a cancelled caller
+    doesn't cancel the shared task for the others.
+    '''
+    def __init__(self):
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        '''Runs func() or joins the call already in flight for the key'''
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        '''Drops finished task, marking its exception as retrieved if nobody waits'''
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,99 @@
+'''
+Read-only local dictionary snapshot: common words are served without network or database.
+Built from the words the bot has already collected by build_snapshot.py
+'''
+import logging
+import os
+import sqlite3
+
+from sqlalchemy import func, select
+
+from app.config import config
+from app.database import read_session, DictionaryEntry, UserWord
+from app.utils.dictionary import WordData
+
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('word', 'transcription', 'translation', 'example', 'audio_url', 'audio_file_id')
+
+
+class DictionarySnapshot:
+    '''SQLite file opened read-only on first use, every lookup is one primary key read'''
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._checked = False
+        self.columns = COLUMNS
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if not self._checked:
+            self._checked = True
+            if os.path.exists(self.path):
+                self._conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True,
+                                             check_same_thread=False)
+                # Files built by older versions have fewer columns
+                present = {row[1] for row in self._conn.execute('PRAGMA table_info(words)')}
+                self.columns = tuple(column for column in COLUMNS if column in present)
+                logger.info('Dictionary snapshot loaded', extra={'path': self.path})
+            else:
+                logger.info('Dictionary snapshot not found', extra={'path': self.path})
+        return self._conn
+
+    def get(self, word: str) -> WordData | None:
+        '''Returns word data if the word is in snapshot'''
+        conn = self._connect()
+        if conn is None:
+            return None
+        row = conn.execute(
+            f'SELECT {", ".join(self.columns)} FROM words WHERE word = ?', (word.lower(),)
+        ).fetchone()
+        return WordData(**dict(zip(self.columns, row))) if row else None
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._checked = False
+
+
+snapshot = DictionarySnapshot(config.SNAPSHOT_PATH)
+
+
+async def build_snapshot(path: str, limit: int) -> int:
+    '''
+    Writes the most saved dictionary entries to a new SQLite file
+    and atomically replaces the old one. Returns number of words
+    '''
+    saves = func.count(UserWord.id)
+    query = (
+        select(*(getattr(DictionaryEntry, column) for column in COLUMNS))
+        .outerjoin(UserWord, UserWord.entry_id == DictionaryEntry.id)
+        .group_by(DictionaryEntry.id)
+        .order_by(saves.desc(), DictionaryEntry.word)
+        .limit(limit)
+        .execution_options(yield_per=1000)
+    )
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute(
+        'CREATE TABLE words (word TEXT PRIMARY KEY, transcription TEXT, translation TEXT, '
+        'example TEXT, audio_url TEXT, audio_file_id TEXT) WITHOUT ROWID'
+    )
+    count = 0
+    async with read_session() as session:
+        result = await session.stream(query)
+        async for rows in result.partitions():
+            conn.executemany(f'INSERT INTO words VALUES ({", ".join("?" * len(COLUMNS))})', rows)
+            count += len(rows)
+    conn.commit()
+    conn.execute('VACUUM')
+    conn.close()
+
+    os.replace(tmp_path, path)
+    return count
@@ -0,0 +1,155 @@
+'''
+"Did you mean": in-memory index of known words, so typos get suggestions
+without dictionary & Wikipedia requests. Built from a bundled wordlist and
+the shared dictionary, every newly saved word is added on the fly
+'''
+import logging
+import os
+
+from sqlalchemy import select
+
+from app.config import config
+from app.database import read_session, DictionaryEntry
+
+
+logger = logging.getLogger(__name__)
+
+# Suggestions travel in callback data, which Telegram limits to 64 bytes
+MAX_WORD_LENGTH = 50
+# Only deletions of the first letters are indexed, long words share most of them
+PREFIX_LENGTH = 7
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    '''
+    Damerau-Levenshtein distance (adjacent transpositions count as one edit),
+    stops early and returns limit + 1 once the words are further apart
+    '''
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def deletions(word: str, depth: int) -> set[str]:
+    '''The word and all its variants with up to `depth` letters removed'''
+    result = edge = {word}
+    for _ in range(depth):
+        edge = {variant[:i] + variant[i + 1:] for variant in edge for i in range(len(variant))}
+        result = result | edge
+    return result
+
+
+class SpellingIndex:
+    '''
+    SymSpell-style deletion index: every word is stored under its prefix and
+    the prefix's one-letter deletions, a lookup generates deletions of the input
+    and reads them from a dict. Covers one edit of any kind and most two-edit
+    typos without scanning the word list
+    '''
+    def __init__(self, max_distance: int = config.SPELLING_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.words: dict[str, int] = {}  # word -> rank, the common ones were added first
+        self._deletes: dict[str, str | list[str]] = {}  # most keys have one word, kept without a list
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word.lower() in self.words
+
+    def add(self, word: str) -> None:
+        word = word.lower()
+        if word in self.words:
+            return
+        self.words[word] = len(self.words)
+        for key in deletions(word[:PREFIX_LENGTH], 1):
+            bucket = self._deletes.get(key)
+            if bucket is None:
+                self._deletes[key] = word
+            elif isinstance(bucket, str):
+                self._deletes[key] = [bucket, word]
+            else:
+                bucket.append(word)
+
+    def suggest(self, word: str, limit: int = config.SPELLING_SUGGESTIONS) -> list[str]:
+        '''Known words closest to the input, the common ones first on a tie'''
+        word = word.lower()
+        # Short words have too many neighbours two edits away
+        max_distance = min(self.max_distance, 1 if len(word) <= 5 else 2)
+        candidates = set()
+        for key in deletions(word[:PREFIX_LENGTH], max_distance):
+            bucket = self._deletes.get(key)
+            if isinstance(bucket, str):
+                candidates.add(bucket)
+            elif bucket:
+                candidates.update(bucket)
+        candidates.discard(word)
+
+        scored = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, self.words[candidate], candidate))
+        return [candidate for *_, candidate in sorted(scored)[:limit]]
+
+    def typo_suggestions(self, word: str) -> list[str]:
+        '''
+        Suggestions when the input looks like a typo: unknown, but close to known
+        words. Capitalized input may be a proper noun and is always looked up.
+        A real word missing from the index is usually as close to several known
+        words, so the input is looked up unless one of them is the closest
+        '''
+        if (not self.ready or not config.SPELLING_MIN_LENGTH <= len(word) <= MAX_WORD_LENGTH
+                or word[0].isupper() or word in self):
+            return []
+        suggestions = [suggestion for suggestion in self.suggest(word) if len(suggestion) <= MAX_WORD_LENGTH]
+        distances = [edit_distance(word.lower(), suggestion, self.max_distance) for suggestion in suggestions[:2]]
+        if len(distances) == 2 and distances[0] == distances[1]:
+            return []
+        return suggestions
+
+
+spelling = SpellingIndex()
+
+
+def read_wordlist(path: str) -> list[str]:
+    '''Words of a bundled list, one per line, the most common first'''
+    if not os.path.exists(path):
+        logger.info('Wordlist not found', extra={'path': path})
+        return []
+    with open(path, encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+async def load_spelling_index(index: SpellingIndex = spelling, path: str = config.SPELLING_WORDLIST_PATH) -> None:
+    '''
+    Fills the index from the wordlist and the shared dictionary, then enables
+    suggestions. Runs in background of every process, lookups work as usual meanwhile
+    '''
+    for word in read_wordlist(path):
+        index.add(word)
+
+    try:
+        async with read_session() as session:
+            result = await session.stream_scalars(select(DictionaryEntry.word).execution_options(yield_per=5000))
+            async for words in result.partitions():  # yields to the event loop between batches
+                for word in words:
+                    index.add(word)
+    except Exception:
+        # Without dictionary words too many known words would look like typos
+        logger.exception('Spelling index loading failed')
+        return
+
+    index.ready = True
+    logger.info('Spelling index loaded', extra={'words': len(index)})
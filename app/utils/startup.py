@@ -0,0 +1,118 @@
+'''
+Cold start: schema version check instead of create_all, pre-warmed
+DB pool & upstream connections, timings of every startup phase
+'''
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from sqlalchemy import inspect, text
+
+from app.config import config
+from app.database import engine, engines
+from app.utils.http_client import get_http_session
+from app.utils.metrics import STARTUP_PHASE
+from app.utils.translator import translation_batcher
+
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'migrations')
+
+
+class StartupTimer:
+    '''Measures startup phases, the summary goes to log and metrics'''
+    def __init__(self, started: float):
+        self.started = started
+        self.phases: dict[str, float] = {'imports': time.perf_counter() - started}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def report(self) -> None:
+        total = time.perf_counter() - self.started
+        for name, value in self.phases.items() | {('total', total)}:
+            STARTUP_PHASE.labels(name).set(value)
+        logger.info('Startup finished', extra={'total_ms': round(total * 1000),
+                                               **{f'{name}_ms': round(value * 1000)
+                                                  for name, value in self.phases.items()}})
+
+
+def migration_heads() -> set[str]:
+    '''Head revisions of migrations/, alembic is imported only here'''
+    from alembic.script import ScriptDirectory
+
+    return set(ScriptDirectory(MIGRATIONS_PATH).get_heads())
+
+
+async def check_schema() -> None:
+    '''
+    Compares database revision with migration heads, one small query
+    instead of reflecting every table. The schema itself is managed by
+    `alembic upgrade head` (release command on fly.io)
+    '''
+    heads = asyncio.create_task(asyncio.to_thread(migration_heads))
+    async with engine.connect() as conn:
+        current = set()  # no alembic_version table: migrations never ran
+        if await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table('alembic_version')):
+            current = set((await conn.execute(text('SELECT version_num FROM alembic_version'))).scalars())
+
+    expected = await heads
+    if current != expected:
+        raise RuntimeError(f'Database schema is at {", ".join(sorted(current)) or "no revision"}, '
+                           f'the code needs {", ".join(sorted(expected))}: run `alembic upgrade head`')
+
+
+async def warm_db_pool(connections: int = config.WARM_DB_CONNECTIONS) -> None:
+    '''Opens pool connections of every engine ahead of the first updates'''
+    async def connect(engine) -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text('SELECT 1'))
+
+    await asyncio.gather(*(connect(engine) for engine in engines.values() for _ in range(connections)))
+
+
+async def warm_http() -> None:
+    '''
+    Sets up TCP & TLS connections to the upstream hosts, they stay in the
+    keep-alive pools. Failures don't matter: the lookup will connect again
+    '''
+    session = get_http_session()
+
+    async def touch(url: str) -> None:
+        parts = urlsplit(url)
+        try:
+            async with session.head(f'{parts.scheme}://{parts.netloc}/', allow_redirects=False):
+                pass
+        except Exception as e:
+            logger.warning('Upstream warm-up failed', extra={'url': url, 'error': repr(e)})
+
+    urls = [config.DICTIONARY_API_URL, config.WIKI_URL]
+    if config.TWINWORD_API_KEY:
+        urls.append(config.TWINWORD_API_URL)
+    await asyncio.gather(*(touch(url) for url in urls), translation_batcher.warm_up())
+
+
+async def warm_up(timer: StartupTimer, schema_check: bool = True) -> None:
+    '''Database & upstream phases of startup, run concurrently where possible'''
+    async def database() -> None:
+        if schema_check:
+            with timer.phase('schema_check'):
+                await check_schema()
+        with timer.phase('db_pool'):
+            await warm_db_pool()
+
+    async def upstream() -> None:
+        if config.WARM_HTTP:
+            with timer.phase('http'):
+                await warm_http()
+
+    await asyncio.gather(database(), upstream())
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from app.config import config
+from app.utils.metrics import UPSTREAM_LATENCY
+from app.utils.resilience import providers
+
+if TYPE_CHECKING:
+    from googletrans import Translator
+
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationBatcher:
+    '''
+    Collects concurrent translation requests for a short window (or until
+    max_size words) and sends them to Google Translate as one call with
+    a shared long-lived translator. Every caller gets its own result.
+    '''
+    def __init__(self, window: float, max_size: int):
+        self.window = window
+        self.max_size = max_size
+        self._translator: 'Translator | None' = None
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def translator(self) -> 'Translator':
+        if self._translator is None:
+            from googletrans import Translator  # with httpx, imported on first use
+
+            self._translator = Translator()
+        return self._translator
+
+    async def warm_up(self) -> None:
+        '''Imports googletrans off the event loop and opens connection to Google'''
+        await asyncio.to_thread(lambda: self.translator)
+        try:
+            await self.translator.client.head(f'https://{self.translator.service_urls[0]}/')
+        except Exception as e:
+            logger.warning('Translator warm-up failed', extra={'error': repr(e)})
+
+    async def translate(self, word: str) -> str | None:
+        '''Translates the word to Russian within the next batch'''
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(word, []).append(future)
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        '''Sends collected words in background task'''
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: dict[str, list[asyncio.Future]]) -> None:
+        '''Translates the batch under provider limits and resolves waiters'''
+        words = list(batch)
+        translations = await self._translate_with_retries(words)
+
+        for word, translation in zip(words, translations):
+            for future in batch[word]:
+                if not future.done():
+                    future.set_result(translation)
+
+    async def _translate_with_retries(self, words: list[str]) -> list[str | None]:
+        '''Rate limit, retries & circuit breaker of "translate" provider'''
+        upstream = providers['translate']
+        if not upstream.allow():
+            return [None] * len(words)
+
+        for attempt in range(upstream.retries + 1):
+            await upstream.throttle()
+            status = 'error'
+            start = time.perf_counter()
+            try:
+                translations = await self._translate_many(words)
+                status = 'ok'
+                logger.debug('Translated by Google Translate', extra={'words': len(words)})
+                upstream.record_success()
+                return translations
+            except Exception as e:
+                logger.warning('Translation failed', extra={'error': repr(e), 'attempt': attempt})
+            finally:
+                UPSTREAM_LATENCY.labels('translate', status).observe(time.perf_counter() - start)
+            if attempt < upstream.retries:
+                await upstream.backoff(attempt)
+
+        upstream.record_failure()
+        return [None] * len(words)
+
+    async def _translate_many(self, words: list[str]) -> list[str]:
+        '''
+        Words joined by line breaks are translated in one request.
+        googletrans translates a list item by item, so it's used only
+        if Google merged or split lines
+        '''
+        result = await self.translator.translate('\n'.join(words), src='en', dest='ru')
+        lines = result.text.split('\n')
+        if len(lines) == len(words):
+            return [line.strip() for line in lines]
+
+        results = await self.translator.translate(words, src='en', dest='ru')
+        return [item.text for item in results]
+
+    async def close(self) -> None:
+        '''Closes translator HTTP client'''
+        if self._translator is not None:
+            await self._translator.client.aclose()
+            self._translator = None
+
+
+translation_batcher = TranslationBatcher(config.TRANSLATE_BATCH_WINDOW, config.TRANSLATE_BATCH_SIZE)
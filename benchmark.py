@@ -0,0 +1,472 @@
+'''
+Offline load test: synthetic updates go through the real dispatcher & router,
+Bot API and upstream APIs (dictionaryapi.dev, Twinword, Wikipedia, Google Translate)
+are local stubs with configurable latency and error rate.
+
+    python benchmark.py [--scenario lookup|save|export|all] [--db sqlite+aiosqlite:///bench.sqlite]
+    python benchmark.py --json bench.json                      # save results
+    python benchmark.py --baseline bench.json --tolerance 0.15  # exit 1 on regression
+
+SQLite runs need `pip install aiosqlite`. Point --db to a scratch database:
+its tables are created if missing and benchmark users are cleared on start.
+'''
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from itertools import count
+from typing import Any, Awaitable, Callable
+
+import httpx
+from aiohttp import web
+from aiogram import BaseMiddleware, Bot
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Audio, Chat, InputFile, Message, TelegramObject, Update
+
+
+FIRST_USER_ID = 10 ** 12  # far from real Telegram ids
+GREETINGS = ('hi', 'hey', 'hello')  # words starting so are taken for greetings
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Load test of the bot with synthetic updates')
+    parser.add_argument('--scenario', choices=('lookup', 'save', 'export', 'all'), default='all')
+    parser.add_argument('--db', help='database URL, temporary SQLite file by default')
+    parser.add_argument('--updates', type=int, default=2000, help='updates per scenario')
+    parser.add_argument('--users', type=int, default=200, help='number of chats')
+    parser.add_argument('--concurrency', type=int, default=100, help='updates processed at once')
+    parser.add_argument('--vocabulary', type=int, default=5000, help='distinct words, looked up by Zipf law')
+    parser.add_argument('--export-words', type=int, default=2000, help='saved words per user in export')
+    parser.add_argument('--latency', type=float, default=0.08, help='mean upstream latency, seconds')
+    parser.add_argument('--jitter', type=float, default=0.5, help='latency spread, share of mean')
+    parser.add_argument('--error-rate', type=float, default=0.01, help='share of upstream 503 responses')
+    parser.add_argument('--unknown-rate', type=float, default=0.05, help='share of words missing in dictionary')
+    parser.add_argument('--no-limits', action='store_true', help='disable outbound rate limits')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='results file to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown vs baseline')
+    return parser.parse_args()
+
+
+def is_unknown(word: str, rate: float) -> bool:
+    '''Stable choice of words the stub dictionary doesn't know'''
+    return zlib.crc32(word.encode()) % 10_000 < rate * 10_000
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list[str]:
+    '''Random valid English-like words'''
+    words = set()
+    while len(words) < size:
+        word = ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10)))
+        if not word.startswith(GREETINGS):
+            words.add(word)
+    return sorted(words)
+
+
+class UpstreamStub:
+    '''Local stand-in for all outbound APIs, one aiohttp server'''
+    def __init__(self, latency: float, jitter: float, error_rate: float, unknown_rate: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.unknown_rate = unknown_rate
+        self.requests: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.url = ''
+        self._runner: web.AppRunner | None = None
+
+    async def _respond(self, name: str) -> web.Response | None:
+        '''Simulates network latency, returns error response sometimes'''
+        self.requests[name] += 1
+        await asyncio.sleep(max(0.0, random.gauss(self.latency, self.latency * self.jitter)))
+        if random.random() < self.error_rate:
+            self.errors[name] += 1
+            return web.json_response({'message': 'Service Unavailable'}, status=503)
+        return None
+
+    async def dictionary(self, request: web.Request) -> web.Response:
+        word = request.match_info['word']
+        if error := await self._respond('dictionary'):
+            return error
+        if is_unknown(word, self.unknown_rate):
+            return web.json_response({'title': 'No Definitions Found'}, status=404)
+        return web.json_response([{
+            'word': word,
+            'phonetics': [{'text': f'/{word}/', 'audio': f'//stub/audio/{word}.mp3'}],
+            'meanings': [{
+                'partOfSpeech': 'noun',
+                'definitions': [{'definition': f'Meaning of {word}.',
+                                 'example': f'This is {word}.' if len(word) % 2 else None}]
+            }]
+        }])
+
+    async def twinword(self, request: web.Request) -> web.Response:
+        if error := await self._respond('twinword'):
+            return error
+        return web.json_response({'entry': request.query.get('entry'),
+                                  'example': [f'An example with {request.query.get("entry")}.']})
+
+    async def wiki(self, request: web.Request) -> web.Response:
+        if error := await self._respond('wiki'):
+            return error
+        return web.Response(status=404)
+
+    async def translate(self, request: web.Request) -> web.Response:
+        '''Google Translate "gtx" client format'''
+        if error := await self._respond('translate'):
+            return error
+        text = request.query['q']
+        translated = '\n'.join(f'перевод-{line}' for line in text.split('\n'))
+        return web.json_response([[[translated, text, None, None, 10]], None, 'en'])
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/dictionary/{word}', self.dictionary)
+        app.router.add_get('/twinword/example/', self.twinword)
+        app.router.add_get('/wiki/{title}', self.wiki)
+        app.router.add_get('/translate_a/single', self.translate)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}'
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+
+class LocalTransport(httpx.AsyncBaseTransport):
+    '''googletrans always calls https://translate.googleapis.com, requests go to the stub instead'''
+    def __init__(self, base_url: str):
+        self.base = httpx.URL(base_url)
+        self.transport = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme=self.base.scheme, host=self.base.host, port=self.base.port)
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class StubSession(BaseSession):
+    '''Bot API stand-in: every method succeeds at once, sent documents are read to the end'''
+    def __init__(self):
+        super().__init__()
+        self.calls: Counter[str] = Counter()
+        self.sent_bytes = 0
+        self._message_ids = count(1)
+
+    async def make_request(self, bot: Bot, method, timeout: int | None = None) -> Any:
+        self.calls[type(method).__name__] += 1
+        document = getattr(method, 'document', None)
+        if isinstance(document, InputFile):
+            async for chunk in document.read(bot):
+                self.sent_bytes += len(chunk)
+
+        if method.__returning__ is not Message:
+            return True
+        message_id = next(self._message_ids)
+        audio = None
+        if type(method).__name__ == 'SendAudio':
+            audio = Audio(file_id=f'audio-{message_id}', file_unique_id=f'u{message_id}', duration=1)
+        return Message(
+            message_id=message_id,
+            date=datetime.now(timezone.utc),
+            chat=Chat(id=method.chat_id, type='private'),
+            text=getattr(method, 'text', None),
+            audio=audio
+        ).as_(bot)
+
+    async def stream_content(self, url: str, headers: dict | None = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True):
+        yield b''
+
+    async def close(self) -> None:
+        pass
+
+
+class Recorder(BaseMiddleware):
+    '''Inner middleware: raw handler durations, the metrics histogram is too coarse for percentiles'''
+    def __init__(self):
+        self.samples: defaultdict[str, list[float]] = defaultdict(list)
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any]
+            ) -> Any:
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            name = data['handler'].callback.__name__ if 'handler' in data else 'unknown'
+            self.samples[name].append(time.perf_counter() - start)
+
+
+class UpdateFactory:
+    '''Synthetic private chat updates, already mounted to the bot'''
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self._ids = count(1)
+
+    def _base(self, user_id: int) -> tuple[dict, dict]:
+        user = {'id': user_id, 'is_bot': False, 'first_name': 'Bench'}
+        message = {'message_id': next(self._ids), 'date': int(time.time()),
+                   'chat': {'id': user_id, 'type': 'private'}, 'from': user}
+        return user, message
+
+    def message(self, user_id: int, text: str) -> Update:
+        _, message = self._base(user_id)
+        return Update.model_validate({'update_id': next(self._ids), 'message': message | {'text': text}},
+                                     context={'bot': self.bot})
+
+    def callback(self, user_id: int, data: str) -> Update:
+        user, message = self._base(user_id)
+        callback = {'id': str(next(self._ids)), 'from': user, 'chat_instance': 'bench',
+                    'data': data, 'message': message | {'text': 'bench'}}
+        return Update.model_validate({'update_id': next(self._ids), 'callback_query': callback},
+                                     context={'bot': self.bot})
+
+
+def percentiles(samples: list[float]) -> dict:
+    '''Count, p50, p95 & p99 in milliseconds'''
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else 0.0
+        return {'count': len(samples), 'p50': value, 'p95': value, 'p99': value}
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {'count': len(samples), 'p50': cuts[49] * 1000, 'p95': cuts[94] * 1000, 'p99': cuts[98] * 1000}
+
+
+def configure_env(args: argparse.Namespace) -> None:
+    '''App config is read on import, so the environment is prepared first'''
+    db_url = args.db or f'sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), "bench.sqlite")}'
+    os.environ['DATABASE_URL'] = db_url
+    os.environ.setdefault('BOT_TOKEN', '123456:bench-token')
+    os.environ.setdefault('TWINWORD_API_KEY', 'bench')
+    os.environ.setdefault('SNAPSHOT_PATH', '')
+    os.environ.setdefault('LOG_LEVEL', 'ERROR')
+    if args.no_limits:
+        for provider in ('DICTIONARY', 'TWINWORD', 'TRANSLATE', 'WIKI'):
+            os.environ[f'{provider}_RATE'] = '1000000'
+            os.environ[f'{provider}_BURST'] = '1000000'
+
+
+async def run(args: argparse.Namespace) -> dict:
+    configure_env(args)
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+
+    upstream = UpstreamStub(args.latency, args.jitter, args.error_rate, args.unknown_rate)
+    base_url = await upstream.start()
+    os.environ['DICTIONARY_API_URL'] = f'{base_url}/dictionary'
+    os.environ['TWINWORD_API_URL'] = f'{base_url}/twinword'
+    os.environ['WIKI_URL'] = f'{base_url}/wiki'
+
+    from googletrans import Translator
+    from main import create_dispatcher
+    from app.database import Base, engine
+    from app.database import db_requests as rq
+    from app.keyboards import ExportCallback
+    from app.utils import ExportFormat, WordData, word_cache
+    from app.utils.http_client import close_http_session, start_http_session
+    from app.utils.logger import setup_logging
+    from app.utils.translator import translation_batcher
+
+    log_listener = setup_logging()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await start_http_session()
+
+    translator = Translator()
+    await translator.client.aclose()
+    translator.client = httpx.AsyncClient(transport=LocalTransport(base_url))
+    translation_batcher._translator = translator
+
+    session = StubSession()
+    bot = Bot(token=os.environ['BOT_TOKEN'], session=session)
+    dp = create_dispatcher()
+    recorder = Recorder()
+    dp.message.middleware(recorder)
+    dp.callback_query.middleware(recorder)
+    updates = UpdateFactory(bot)
+
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    users = [FIRST_USER_ID + i for i in range(args.users)]
+    for user_id in users:
+        await rq.clear_user_db(user_id)
+
+    def zipf_words(k: int) -> list[str]:
+        return rng.choices(vocabulary, weights, k=k)
+
+    async def seed_saved_words() -> None:
+        '''Export users own many resolved words, prepared without the bot'''
+        known = [word for word in vocabulary if not is_unknown(word, args.unknown_rate)]
+        chosen = known[:args.export_words]
+        for word in chosen:
+            await rq.save_entry(WordData(word=word, transcription=f'/{word}/', translation=f'перевод-{word}',
+                                            example=f'This is {word}.'))
+        for user_id in users:
+            await rq.add_user_words(user_id, chosen)
+
+    def lookup_jobs() -> list[list[Update]]:
+        '''Storm of word lookups, one update per job'''
+        return [[updates.message(rng.choice(users), word)] for word in zipf_words(args.updates)]
+
+    def save_jobs() -> list[list[Update]]:
+        '''Lookup followed by "Add" tap in the same chat'''
+        return [[updates.message(user_id, word), updates.callback(user_id, 'add')]
+                for user_id, word in zip(rng.choices(users, k=args.updates // 2), zipf_words(args.updates // 2))]
+
+    def export_jobs() -> list[list[Update]]:
+        '''Every user exports the whole dictionary'''
+        formats = list(ExportFormat)
+        return [[updates.callback(user_id, ExportCallback(fmt=rng.choice(formats),
+                                                          extended=rng.random() < 0.5).pack())]
+                for user_id in users]
+
+    scenarios = {'lookup': (lookup_jobs, None), 'save': (save_jobs, None),
+                 'export': (export_jobs, seed_saved_words)}
+    names = list(scenarios) if args.scenario == 'all' else [args.scenario]
+
+    results = {}
+    try:
+        for name in names:
+            make_jobs, prepare = scenarios[name]
+            if prepare:
+                await prepare()
+            word_cache.clear()
+            recorder.samples.clear()
+            upstream.requests.clear()
+            upstream.errors.clear()
+            session.calls.clear()
+            jobs = make_jobs()
+            results[name] = await run_jobs(dp, bot, jobs, args.concurrency, recorder, upstream, session)
+            print_result(name, results[name])
+    finally:
+        await translation_batcher.close()
+        await close_http_session()
+        await bot.session.close()
+        await upstream.stop()
+        await engine.dispose()
+        log_listener.stop()
+    return results
+
+
+async def run_jobs(dp, bot: Bot, jobs: list[list[Update]], concurrency: int, recorder: Recorder,
+                   upstream: UpstreamStub, session: StubSession) -> dict:
+    '''Jobs run concurrently, updates within a job (one chat) go in order'''
+    from app.middlewares import ChatOrderMiddleware
+
+    queue: asyncio.Queue[list[Update]] = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+    latencies: list[float] = []
+    failures = 0
+    # Dropped updates come back as UNHANDLED in no time, they are counted apart from latencies
+    scheduler = next(m for m in dp.update.outer_middleware if isinstance(m, ChatOrderMiddleware))
+    dropped_before = scheduler.dropped.copy()
+
+    async def worker() -> None:
+        nonlocal failures
+        while not queue.empty():
+            for update in queue.get_nowait():
+                start = time.perf_counter()
+                try:
+                    response = await dp.feed_update(bot, update)
+                except Exception:
+                    failures += 1
+                else:
+                    if response is UNHANDLED:
+                        continue
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(jobs)))))
+    elapsed = time.perf_counter() - start
+    dropped = scheduler.dropped - dropped_before
+
+    return {
+        'updates': len(latencies),
+        'failures': failures,
+        'dropped': dict(dropped),
+        'seconds': elapsed,
+        'updates_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'update': percentiles(latencies),
+        'handlers': {name: percentiles(samples) for name, samples in sorted(recorder.samples.items())},
+        'upstream_requests': dict(upstream.requests),
+        'upstream_errors': dict(upstream.errors),
+        'bot_api_calls': dict(session.calls),
+    }
+
+
+def print_result(name: str, result: dict) -> None:
+    print(f'\n== {name}: {result["updates"]} updates in {result["seconds"]:.2f}s, '
+          f'{result["updates_per_sec"]:.1f} updates/s, {result["failures"]} failed, '
+          f'{sum(result["dropped"].values())} dropped')
+    if result['dropped']:
+        print('dropped: ' + ', '.join(f'{reason} {n}' for reason, n in sorted(result['dropped'].items())))
+    print(f'{"handler":<24}{"count":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+    for handler, stats in {'(update)': result['update'], **result['handlers']}.items():
+        print(f'{handler:<24}{stats["count"]:>8}{stats["p50"]:>10.1f}{stats["p95"]:>10.1f}{stats["p99"]:>10.1f}')
+    print(f'upstream: {result["upstream_requests"]}, errors: {result["upstream_errors"]}')
+    print(f'bot api: {result["bot_api_calls"]}')
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    '''Lists throughput drops and p95 growths beyond tolerance'''
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if sum(result['dropped'].values()) > sum(base.get('dropped', {}).values()):
+            regressions.append(f'{name}: {sum(result["dropped"].values())} updates dropped, '
+                               f'baseline {sum(base.get("dropped", {}).values())}')
+        if result['updates_per_sec'] < base['updates_per_sec'] * (1 - tolerance):
+            regressions.append(f'{name}: {result["updates_per_sec"]:.1f} updates/s, '
+                               f'baseline {base["updates_per_sec"]:.1f}')
+        for handler, stats in result['handlers'].items():
+            base_stats = base['handlers'].get(handler)
+            if base_stats and stats['p95'] > base_stats['p95'] * (1 + tolerance):
+                regressions.append(f'{name}/{handler}: p95 {stats["p95"]:.1f} ms, '
+                                   f'baseline {base_stats["p95"]:.1f} ms')
+    return regressions
+
+
+def main() -> None:
+    args = parse_args()
+    results = asyncio.run(run(args))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            sys.exit(1)
+        print('\nNo regressions against baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+'''
+Builds or refreshes the offline dictionary snapshot from collected words:
+    python build_snapshot.py [--path data/dictionary_snapshot.sqlite] [--limit 20000]
+'''
+import argparse
+import asyncio
+
+from app.config import config
+from app.utils.snapshot import build_snapshot
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Build dictionary snapshot from collected words')
+    parser.add_argument('--path', default=config.SNAPSHOT_PATH, help='SQLite file to write')
+    parser.add_argument('--limit', type=int, default=config.SNAPSHOT_SIZE, help='max number of words')
+    args = parser.parse_args()
+
+    count = asyncio.run(build_snapshot(args.path, args.limit))
+    print(f'Snapshot {args.path}: {count} words')
+
+
+if __name__ == '__main__':
+    main()
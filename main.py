@@ -1,46 +1,323 @@
 import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from dataclasses import asdict
+
+IMPORTS_STARTED = time.perf_counter()  # the imports below are a startup phase too
+
+import aiohttp
 from aiohttp import web
 from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 from app import config, router
-from app.database import Base, engine
+from app.database import engines
+from app.database.fsm_storage import DatabaseStorage
+from app.middlewares import ChatOrderMiddleware, HandlerTimingMiddleware, UpdatesInProgressMiddleware
+from app.utils import word_cache
+from app.utils.audio_preload import run_audio_preload
+from app.utils.http_client import start_http_session, close_http_session
+from app.utils.logger import setup_logging
+from app.utils.metrics import WORKER_UP, register_stats, render_metrics
+from app.utils.quiz import review_buffer
+from app.utils.resilience import providers, split_limits
+from app.utils.spelling import load_spelling_index
+from app.utils.startup import StartupTimer, check_schema, warm_up
+from app.utils.translator import translation_batcher
+
 
+logger = logging.getLogger(__name__)
+
+# Time workers get to finish their updates and flush buffers on shutdown
+WORKERS_STOP_TIMEOUT = 20
 
-async def init_database() -> None:
-    '''Create database table asynchronously'''
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
 
 async def healthcheck(_: web.Request) -> web.Response:
     '''Simple HTTP health check endpoint'''
     return web.Response(text='OK')
 
-async def bot_start() -> None:
-    '''Initialize and start bot using polling'''
-    bot = Bot(token=config.BOT_TOKEN)
-    dp = Dispatcher()
+async def metrics(_: web.Request) -> web.Response:
+    '''Prometheus metrics endpoint'''
+    body, content_type = render_metrics()
+    return web.Response(body=body, headers={'Content-Type': content_type})
+
+def create_dispatcher() -> Dispatcher:
+    '''Creates dispatcher with all bot routers'''
+    dp = Dispatcher(storage=DatabaseStorage())
+    # The scheduler goes before FSM middleware, so a chat's state is read in its turn
+    dp.update.outer_middleware.unregister(dp.fsm)
+    dp.update.outer_middleware(ChatOrderMiddleware())
+    dp.update.outer_middleware(dp.fsm)
+    dp.update.outer_middleware(UpdatesInProgressMiddleware())
+    dp.message.middleware(HandlerTimingMiddleware())
+    dp.callback_query.middleware(HandlerTimingMiddleware())
     dp.include_router(router)
+    return dp
 
+def log_stats() -> None:
+    '''Reports word cache and outbound APIs counters'''
+    logger.info('Word cache stats', extra=asdict(word_cache.stats))
+    for name, provider in providers.items():
+        logger.info('Provider stats', extra={'provider': name, 'trips': provider.breaker.trips,
+                                             **asdict(provider.stats)})
+
+async def bot_start(bot: Bot, dp: Dispatcher) -> None:
+    '''Start bot using polling'''
     try:
-        print('Bot is starting now...')
-        await dp.start_polling(bot)
+        logger.info('Bot is starting now...')
+        # Polling stops fetching while the scheduler is full, Telegram keeps the rest
+        await dp.start_polling(
+            bot,
+            tasks_concurrency_limit=config.UPDATES_CONCURRENCY + config.UPDATES_QUEUE_LIMIT
+        )
     finally:
-        print('Bot has been shut down gracefully')
+        log_stats()
+        logger.info('Bot has been shut down gracefully')
 
-async def main() -> None:
-    '''The main entry point'''
-    await init_database()
+def setup_webhook(app: web.Application, bot: Bot, dp: Dispatcher) -> None:
+    '''Mounts Telegram updates endpoint on the same aiohttp app'''
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=config.WEBHOOK_SECRET,
+        handle_in_background=config.WEBHOOK_BACKGROUND
+    ).register(app, path=config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+async def register_webhook(bot: Bot) -> None:
+    '''
+    Registers webhook in Telegram. Without WEBHOOK_BASE_URL Telegram
+    is not notified, so updates can be POSTed to the endpoint locally.
+    '''
+    if config.WEBHOOK_BASE_URL:
+        await bot.set_webhook(
+            url=config.WEBHOOK_BASE_URL.rstrip('/') + config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET,
+            allowed_updates=['message', 'callback_query']
+        )
+
+async def webhook_start(bot: Bot, register: bool = True) -> None:
+    '''Serves updates until stopped, workers leave registration to the front'''
+    if register:
+        await register_webhook(bot)
+    try:
+        logger.info('Bot is waiting for updates', extra={'path': config.WEBHOOK_PATH})
+        await asyncio.Event().wait()
+    finally:
+        log_stats()
+        logger.info('Bot has been shut down gracefully')
+
+def cancel_on_sigterm() -> None:
+    '''
+    SIGTERM (docker stop, the front stopping its workers) cancels the main task
+    like Ctrl+C does, so shutdown cleanup runs instead of the process being killed
+    '''
+    task = asyncio.current_task()
+
+    def stop() -> None:
+        if not task.cancelling():  # a second cancel would interrupt the cleanup
+            task.cancel()
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop)
+
+async def run_bot(worker: int | None = None) -> None:
+    '''
+    Runs the whole bot in this process, or one of the workers
+    behind the front when `worker` index is given
+    '''
+    cancel_on_sigterm()
+    timer = StartupTimer(IMPORTS_STARTED)
+    log_listener = setup_logging()
+    if worker is not None:
+        split_limits(config.WORKERS)
+    await start_http_session()
+    # Schema is checked by the front when there are workers
+    await warm_up(timer, schema_check=worker is None)
+
+    bot = Bot(token=config.BOT_TOKEN)
+    dp = create_dispatcher()
 
     app = web.Application()
     app.router.add_get('/health', healthcheck)
-    
+    app.router.add_get('/metrics', metrics)
+    register_stats(engines, word_cache, providers)
+    if config.BOT_MODE == 'webhook':
+        setup_webhook(app, bot, dp)
+
     runner = web.AppRunner(app)
     await runner.setup()
-    site = web.TCPSite(runner, host='0.0.0.0', port=8080)
+    if worker is None:
+        site = web.TCPSite(runner, host='0.0.0.0', port=8080)
+    else:
+        site = web.UnixSite(runner, worker_socket(worker))
     await site.start()
+    timer.report()
+
+    background = []
+    if not worker:  # database-wide jobs run once: in the only process or in worker 0
+        background.append(asyncio.create_task(dp.storage.run_purging()))
+        if config.AUDIO_PRELOAD_CHAT_ID:
+            background.append(asyncio.create_task(run_audio_preload(bot)))
+    if config.SPELLING_CHECK:  # every process keeps its own index
+        background.append(asyncio.create_task(load_spelling_index()))
+    flushing = asyncio.create_task(review_buffer.run_flushing())
+    try:
+        if config.BOT_MODE == 'webhook':
+            await webhook_start(bot, register=worker is None)
+        else:
+            await bot_start(bot, dp)
+    finally:
+        for task in background:
+            task.cancel()
+        flushing.cancel()
+        await asyncio.gather(flushing, return_exceptions=True)  # writes the last answers
+        await runner.cleanup()
+        await close_http_session()
+        await translation_batcher.close()
+        await bot.session.close()
+        for engine in engines.values():
+            await engine.dispose()
+        log_listener.stop()
+
+def worker_socket(index: int) -> str:
+    return os.path.join(config.WORKERS_SOCKET_DIR, f'worker-{index}.sock')
+
+def run_worker(index: int) -> None:
+    '''Entry point of a worker process'''
+    try:
+        asyncio.run(run_bot(worker=index))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+def start_worker(index: int) -> multiprocessing.Process:
+    process = multiprocessing.get_context('spawn').Process(
+        target=run_worker, args=(index,), name=f'bot-worker-{index}', daemon=True
+    )
+    process.start()
+    return process
+
+def route_key(update: dict) -> int:
+    '''Chat of the update, or its user if there is no chat'''
+    for payload in update.values():
+        if isinstance(payload, dict):
+            chat = (payload.get('chat') or (payload.get('message') or {}).get('chat')
+                    or payload.get('from') or {})
+            return chat.get('id', 0)
+    return 0
+
+async def front_start() -> None:
+    '''
+    Front process for WORKERS > 1: receives webhook updates on port 8080 and
+    forwards each one to a worker chosen by chat id. A chat is always served
+    by the same worker, so its updates stay in order; FSM and dictionary
+    are shared by all workers through the database.
+    '''
+    cancel_on_sigterm()
+    log_listener = setup_logging()
+    await check_schema()
+    os.makedirs(config.WORKERS_SOCKET_DIR, exist_ok=True)
+    workers = [start_worker(index) for index in range(config.WORKERS)]
+    sessions = [aiohttp.ClientSession(connector=aiohttp.UnixConnector(path=worker_socket(index)))
+                for index in range(config.WORKERS)]
+    secret_header = 'X-Telegram-Bot-Api-Secret-Token'
+
+    async def forward(request: web.Request) -> web.Response:
+        '''Passes the update to its worker, Telegram retries it if the worker is down'''
+        if config.WEBHOOK_SECRET and request.headers.get(secret_header) != config.WEBHOOK_SECRET:
+            return web.Response(status=401)
+        body = await request.read()
+        try:
+            update = json.loads(body)
+        except ValueError as e:  # bad UTF-8 included
+            logger.warning('Malformed update', extra={'error': repr(e)})
+            return web.Response(status=400)
+        if not isinstance(update, dict):
+            return web.Response(status=400)
+        index = route_key(update) % config.WORKERS
+        try:
+            async with sessions[index].post(f'http://worker{config.WEBHOOK_PATH}', data=body,
+                                            headers={'Content-Type': 'application/json',
+                                                     secret_header: config.WEBHOOK_SECRET or ''}) as resp:
+                return web.Response(status=resp.status, body=await resp.read(),
+                                    content_type=resp.content_type)
+        except aiohttp.ClientError as e:
+            logger.warning('Worker unavailable', extra={'worker': index, 'error': repr(e)})
+            return web.Response(status=503)
+
+    async def worker_metrics(request: web.Request) -> web.Response:
+        '''Prometheus metrics of one worker process'''
+        index = int(request.match_info['index'])
+        if index >= config.WORKERS:
+            raise web.HTTPNotFound()
+        try:
+            async with sessions[index].get('http://worker/metrics', timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                return web.Response(body=await resp.read(), headers={'Content-Type': resp.headers['Content-Type']})
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning('Worker metrics unavailable', extra={'worker': index, 'error': repr(e)})
+            return web.Response(text='Worker is down', status=503)
+
+    async def front_health(_: web.Request) -> web.Response:
+        alive = all(process.is_alive() for process in workers)
+        return web.Response(text='OK' if alive else 'Worker is down', status=200 if alive else 503)
+
+    app = web.Application()
+    app.router.add_get('/health', front_health)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_get(r'/workers/{index:\d+}/metrics', worker_metrics)
+    app.router.add_post(config.WEBHOOK_PATH, forward)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host='0.0.0.0', port=8080).start()
 
-    await bot_start()
+    bot = Bot(token=config.BOT_TOKEN)
+    await register_webhook(bot)
+    await bot.session.close()
+    logger.info('Front is forwarding updates', extra={'workers': config.WORKERS})
+
+    try:
+        while True:  # restarts crashed workers
+            await asyncio.sleep(5)
+            for index, process in enumerate(workers):
+                WORKER_UP.labels(str(index)).set(process.is_alive())
+                if not process.is_alive():
+                    logger.warning('Worker exited, restarting', extra={'worker': index,
+                                                                      'exitcode': process.exitcode})
+                    workers[index] = start_worker(index)
+    finally:
+        await runner.cleanup()
+        for session in sessions:
+            await session.close()
+        # Only the front gets the signal in a container, workers are stopped explicitly
+        # and all at once, each flushes its quiz answers before exiting
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + WORKERS_STOP_TIMEOUT
+        for process in workers:
+            process.join(timeout=max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning('Worker did not stop in time, killing', extra={'worker': process.name})
+                process.kill()
+        for engine in engines.values():
+            await engine.dispose()
+        log_listener.stop()
+
+async def main() -> None:
+    '''The main entry point'''
+    if config.WORKERS > 1:
+        if config.BOT_MODE != 'webhook':
+            raise SystemExit('WORKERS > 1 needs BOT_MODE=webhook: Telegram allows only one polling client')
+        await front_start()
+    else:
+        await run_bot()
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
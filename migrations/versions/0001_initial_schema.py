@@ -0,0 +1,44 @@
+"""Initial schema: user_words with full word data
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases created by Base.metadata.create_all already have the table
+    if sa.inspect(op.get_bind()).has_table('user_words'):
+        return
+
+    op.create_table(
+        'user_words',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('tg_id', sa.BigInteger(), nullable=False),
+        sa.Column('word', sa.String(70), nullable=False),
+        sa.Column('transcription', sa.String(90), nullable=False),
+        sa.Column('translation', sa.String(120), nullable=False),
+        sa.Column('example', sa.Text(), nullable=False),
+        sa.Column('audio_url', sa.String(255), nullable=False),
+    )
+    op.create_index('ix_user_words_tg_id', 'user_words', ['tg_id'])
+    op.create_index('ix_user_words_word', 'user_words', ['word'])
+    op.create_index('idx_user_word', 'user_words', ['tg_id', 'word'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_words')
@@ -0,0 +1,89 @@
+"""Shared dictionary_entries table, user_words only links users to entries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+WORD_DATA_COLUMNS = ('transcription', 'translation', 'example', 'audio_url')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('dictionary_entries'):
+        op.create_table(
+            'dictionary_entries',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('word', sa.String(70), nullable=False, unique=True),
+            sa.Column('transcription', sa.String(90), nullable=True),
+            sa.Column('translation', sa.String(120), nullable=True),
+            sa.Column('example', sa.Text(), nullable=True),
+            sa.Column('audio_url', sa.String(255), nullable=True),
+        )
+
+    if 'entry_id' in {column['name'] for column in inspector.get_columns('user_words')}:
+        return
+
+    # Move word data of saved words to shared entries, the first saved copy wins.
+    # Empty example becomes NULL, so it is fetched again on demand.
+    op.add_column('user_words', sa.Column('entry_id', sa.Integer(), nullable=True))
+    op.execute(
+        '''
+        INSERT INTO dictionary_entries (word, transcription, translation, example, audio_url)
+        SELECT DISTINCT ON (word)
+               word, NULLIF(transcription, ''), NULLIF(translation, ''),
+               NULLIF(example, ''), NULLIF(audio_url, '')
+        FROM user_words
+        ORDER BY word, id
+        ON CONFLICT (word) DO NOTHING
+        '''
+    )
+    op.execute(
+        '''
+        UPDATE user_words AS u SET entry_id = e.id
+        FROM dictionary_entries AS e
+        WHERE e.word = u.word
+        '''
+    )
+    op.alter_column('user_words', 'entry_id', nullable=False)
+    op.create_foreign_key('user_words_entry_id_fkey', 'user_words', 'dictionary_entries',
+                          ['entry_id'], ['id'], ondelete='CASCADE')
+    for column in WORD_DATA_COLUMNS:
+        op.drop_column('user_words', column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('user_words', sa.Column('transcription', sa.String(90), server_default='', nullable=False))
+    op.add_column('user_words', sa.Column('translation', sa.String(120), server_default='', nullable=False))
+    op.add_column('user_words', sa.Column('example', sa.Text(), server_default='', nullable=False))
+    op.add_column('user_words', sa.Column('audio_url', sa.String(255), server_default='', nullable=False))
+    op.execute(
+        '''
+        UPDATE user_words AS u
+        SET transcription = COALESCE(e.transcription, ''),
+            translation = COALESCE(e.translation, ''),
+            example = COALESCE(e.example, ''),
+            audio_url = COALESCE(e.audio_url, '')
+        FROM dictionary_entries AS e
+        WHERE e.id = u.entry_id
+        '''
+    )
+    for column in WORD_DATA_COLUMNS:
+        op.alter_column('user_words', column, server_default=None)
+    op.drop_constraint('user_words_entry_id_fkey', 'user_words', type_='foreignkey')
+    op.drop_column('user_words', 'entry_id')
+    op.drop_table('dictionary_entries')
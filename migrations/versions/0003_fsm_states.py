@@ -0,0 +1,38 @@
+"""Persistent FSM storage
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if sa.inspect(op.get_bind()).has_table('fsm_states'):
+        return
+
+    op.create_table(
+        'fsm_states',
+        sa.Column('key', sa.String(255), primary_key=True),
+        sa.Column('state', sa.String(100), nullable=True),
+        sa.Column('data', sa.JSON(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('ix_fsm_states_expires_at', 'fsm_states', ['expires_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('fsm_states')
@@ -0,0 +1,48 @@
+"""Unique (tg_id, word) in user_words instead of three overlapping indexes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Double taps on "Add" could save a word twice, keep the first copy
+    op.execute(
+        '''
+        DELETE FROM user_words AS a
+        USING user_words AS b
+        WHERE a.tg_id = b.tg_id AND a.word = b.word AND a.id > b.id
+        '''
+    )
+    # The unique index serves lookups by tg_id and (tg_id, word) alone
+    inspector = sa.inspect(op.get_bind())
+    indexes = {index['name'] for index in inspector.get_indexes('user_words')}
+    for name in ('ix_user_words_tg_id', 'ix_user_words_word', 'idx_user_word'):
+        if name in indexes:
+            op.drop_index(name, table_name='user_words')
+
+    constraints = {uc['name'] for uc in inspector.get_unique_constraints('user_words')}
+    if 'uq_user_word' not in constraints:
+        op.create_unique_constraint('uq_user_word', 'user_words', ['tg_id', 'word'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_user_word', 'user_words', type_='unique')
+    op.create_index('idx_user_word', 'user_words', ['tg_id', 'word'])
+    op.create_index('ix_user_words_word', 'user_words', ['word'])
+    op.create_index('ix_user_words_tg_id', 'user_words', ['tg_id'])
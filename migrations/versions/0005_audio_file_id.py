@@ -0,0 +1,30 @@
+"""Telegram file_id of uploaded pronunciation audio
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 13:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('dictionary_entries')}
+    if 'audio_file_id' not in columns:
+        op.add_column('dictionary_entries', sa.Column('audio_file_id', sa.String(255), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('dictionary_entries', 'audio_file_id')
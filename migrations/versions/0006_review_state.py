@@ -0,0 +1,45 @@
+"""Spaced repetition state of user words
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 13:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    sa.Column('due_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('interval_days', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('ease', sa.Float(), server_default='2.5', nullable=False),
+    sa.Column('repetitions', sa.Integer(), server_default='0', nullable=False),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    existing = {column['name'] for column in inspector.get_columns('user_words')}
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column('user_words', column)
+
+    # Next due cards of a user are one index range scan
+    if 'ix_user_words_due' not in {index['name'] for index in inspector.get_indexes('user_words')}:
+        op.create_index('ix_user_words_due', 'user_words', ['tg_id', 'due_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_words_due', table_name='user_words')
+    for column in COLUMNS:
+        op.drop_column('user_words', column.name)